@@ -1,6 +1,14 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
+import matplotlib
+# Plots are only written to files, so use the non-interactive backend
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from pandas.tseries.holiday import (AbstractHolidayCalendar, Holiday, GoodFriday, USMartinLutherKingJr,
+                                    USPresidentsDay, USMemorialDay, USLaborDay, USThanksgivingDay,
+                                    nearest_workday, sunday_to_monday)
+from pandas.tseries.offsets import CustomBusinessDay
 from strategy.buy_and_hold import BuyAndHoldStrategy
 from strategy.sma import SMAStrategy
 from strategy.macd import MACDStrategy
@@ -8,24 +16,54 @@ from strategy.kdj import KDJStrategy
 from strategy.enhanced_macd import EnhancedMACDStrategy
 from strategy.quantitative_adative import QuantitativeAdaptiveStrategy
 from interface import IStrategy, MarketAction  # Updated import
-from metrics import calculate_sharpe_ratio, calculate_max_drawdown, calculate_beta, calculate_alpha, calculate_win_rate, calculate_profit_factor
+from metrics import calculate_max_drawdown, compute_all_metrics
+from utils._njit import njit
 import config  # Import the config file
 from tqdm import tqdm  # Import tqdm for progress bar
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 STRATEGY = QuantitativeAdaptiveStrategy
 SYMBOL = 'AAPL'
 
+SUPPORTED_STRATEGIES = (
+    BuyAndHoldStrategy,
+    SMAStrategy,
+    MACDStrategy,
+    KDJStrategy,
+    EnhancedMACDStrategy,
+    QuantitativeAdaptiveStrategy
+)
+
+class USExchangeHolidayCalendar(AbstractHolidayCalendar):
+    """
+    Full-day US stock exchange closures. Unlike the federal calendar this
+    includes Good Friday and excludes Columbus Day and Veterans Day.
+    """
+    rules = [
+        Holiday('NewYearsDay', month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-06-19', observance=nearest_workday),
+        Holiday('USIndependenceDay', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday)
+    ]
+
 def plot_backtest_results(portfolio_df, strategy_name, symbol):
     """
     Plot the backtest results comparing portfolio value to stock price performance
     """
     fig, ax1 = plt.subplots(figsize=(10, 6))
     
-    # Plot both normalized series on the same axis
-    ax1.plot(portfolio_df['Date'], portfolio_df['Portfolio Value %'], 
+    # Plot both normalized series on the same axis, passing plain arrays to matplotlib
+    dates = portfolio_df['Date'].to_numpy()
+    ax1.plot(dates, portfolio_df['Portfolio Value %'].to_numpy(), 
              label='Portfolio Value', color='blue')
-    ax1.plot(portfolio_df['Date'], portfolio_df['Stock Price %'], 
+    ax1.plot(dates, portfolio_df['Stock Price %'].to_numpy(), 
              label=f'{symbol} Stock Price', color='orange')
     
     ax1.set_xlabel('Date')
@@ -37,10 +75,70 @@ def plot_backtest_results(portfolio_df, strategy_name, symbol):
     
     # Save the plot to the results directory
     plot_path = f'result_backtest/plots/{symbol}_{strategy_name}_portfolio_value.png'
-    plt.savefig(plot_path)
+    fig.savefig(plot_path)
+    # Release the figure so repeated backtests in one process don't accumulate them
+    plt.close(fig)
     print(f"Plot saved as {plot_path}")
 
-def backtest_strategy(strategy: IStrategy):
+@njit(cache=True)
+def _simulate_crossover(fast, slow, fast_prev, slow_prev, close, valid, initial_cash, quantity):
+    """
+    Compiled equivalent of the daily loop for a fixed-quantity crossover strategy
+    Buys `quantity` shares when fast crosses above slow and sells them when it
+    crosses below, with the same cash and position checks as the loop.
+    Args:
+        fast, slow: Per-day values of the two crossing series
+        fast_prev, slow_prev: The same series on the previous bar (NaN if none)
+        close: Per-day price the decision is made at
+        valid: False for days that have no signal and are skipped
+        initial_cash: Starting cash
+        quantity: Shares bought or sold per signal
+    Returns:
+        portfolio_values, stock_prices: Per simulated day, filled up to `k`
+        k: Number of simulated days
+    """
+    n = close.shape[0]
+    portfolio_values = np.empty(n, dtype=np.float64)
+    stock_prices = np.empty(n, dtype=np.float64)
+    cash = initial_cash
+    position = 0
+    k = 0
+    
+    for i in range(n):
+        if not valid[i]:
+            continue
+        price = close[i]
+        if fast[i] > slow[i] and fast_prev[i] <= slow_prev[i]:
+            if cash >= price * quantity:
+                cash -= price * quantity
+                position += quantity
+        elif fast[i] < slow[i] and fast_prev[i] >= slow_prev[i]:
+            if position >= quantity:
+                cash += price * quantity
+                position -= quantity
+        portfolio_values[k] = cash + position * price
+        stock_prices[k] = price
+        k += 1
+    
+    return portfolio_values, stock_prices, k
+
+def create_strategy(strategy_cls) -> IStrategy:
+    """Instantiate a supported strategy with the API credentials from config"""
+    if strategy_cls not in SUPPORTED_STRATEGIES:
+        raise ValueError(f"Unsupported strategy: {strategy_cls}")
+    return strategy_cls(api_key=config.API_KEY, api_secret=config.SECRET_KEY)
+
+def backtest_strategy(strategy: IStrategy, symbol: str, strategy_name: str, show_progress: bool = True) -> dict:
+    """
+    Backtest a strategy on one symbol over the last year, then save its metrics and plot
+    Args:
+        strategy: Strategy instance to generate the daily decisions
+        symbol: Stock ticker symbol to trade
+        strategy_name: Name used in the report, progress bar and output filenames
+        show_progress: Show a tqdm progress bar for the daily loop
+    Returns:
+        Dict of the computed performance metrics
+    """
     # Set the date range for backtesting (last 365 days, ending a week before today)
     end_date = datetime.now() - timedelta(days=7)
     start_date = end_date - timedelta(days=365)
@@ -51,103 +149,107 @@ def backtest_strategy(strategy: IStrategy):
     cash = initial_cash
     position = 0  # Number of shares held
     
-    # List to store portfolio values and stock prices over time
-    portfolio_values = []
-    stock_prices = []
-    dates = []
-    
-    # Get all dates in range
-    date_range = pd.date_range(start=start_date, end=end_date)
-    # Filter to only include Monday to Friday
-    trading_days = [d for d in date_range if d.weekday() < 5]
-    
-    # Initialize progress bar
-    pbar = tqdm(trading_days, desc=f"Backtesting {STRATEGY.__name__} Progress", dynamic_ncols=True)
-    
-    # Lists to store returns
-    daily_returns = []
-    market_returns = []
-    previous_value = initial_cash
-    previous_market_price = None
-    
-    # Simulate trading
-    for single_date in pbar:
-        try:
-            # Use the generate_signal method to get the trading decision for the current date
-            decision = strategy.generate_signal(SYMBOL, date=single_date, position=position, cash=cash)
-            
-            if decision.action == MarketAction.BUY and cash >= decision.price * decision.quantity:
-                cash -= decision.price * decision.quantity
-                position += decision.quantity
-            elif decision.action == MarketAction.SELL and position >= decision.quantity:
-                cash += decision.price * decision.quantity
-                position -= decision.quantity
-            
-            # Calculate current portfolio value
-            portfolio_value = cash + position * decision.price
-            portfolio_values.append(portfolio_value)
-            stock_prices.append(decision.price)
-            dates.append(single_date)
-            
-            # Calculate daily strategy return
-            daily_return = (portfolio_value - previous_value) / previous_value
-            
-            # Calculate daily market return (using stock price as market proxy)
-            if previous_market_price is not None:
-                market_return = (decision.price - previous_market_price) / previous_market_price
-                market_returns.append(market_return)
-                daily_returns.append(daily_return)
-            
-            previous_value = portfolio_value
-            previous_market_price = decision.price
-            
-            # Update progress bar description
-            profit = portfolio_value - initial_cash
-            pbar.set_postfix({
-                'Date': single_date.strftime('%Y-%m-%d'),
-                'Position': position,
-                'Profit': f'${profit:.2f}'
-            })
-        except Exception as e:
-            print(f"Error on {single_date}: {e}")
-            continue
+    # Get all trading days in range (Monday to Friday, excluding exchange holidays)
+    trading_days = pd.date_range(start=start_date, end=end_date,
+                                 freq=CustomBusinessDay(calendar=USExchangeHolidayCalendar()))
     
-    # Create a DataFrame for portfolio values and stock prices
+    # Let the strategy prefetch data for the whole window up front
+    strategy.prepare(symbol, start=start_date, end=end_date)
+    
+    # Strategies that expose their signal as precomputed crossover series are
+    # simulated in one compiled pass instead of calling generate_signal per day
+    signal_arrays = strategy.signal_arrays(symbol, trading_days)
+    if signal_arrays is not None:
+        close, fast, slow, fast_prev, slow_prev, valid, quantity = signal_arrays
+        portfolio_values, stock_prices, k = _simulate_crossover(
+            fast, slow, fast_prev, slow_prev, close, valid, float(initial_cash), quantity)
+        dates = trading_days.to_numpy(dtype='datetime64[ns]')[valid]
+        errors = [(d, "No indicator values available for this date") for d in trading_days[~valid]]
+    else:
+        # Preallocated arrays for portfolio values and stock prices over time;
+        # `k` counts the days that produced a decision
+        n_days = len(trading_days)
+        portfolio_values = np.empty(n_days, dtype=np.float64)
+        stock_prices = np.empty(n_days, dtype=np.float64)
+        dates = np.empty(n_days, dtype='datetime64[ns]')
+        k = 0
+        
+        # Initialize progress bar
+        pbar = tqdm(trading_days, desc=f"Backtesting {strategy_name} Progress", dynamic_ncols=True,
+                    mininterval=0.5, disable=not show_progress)
+        
+        # Days that failed, reported once after the loop
+        errors = []
+        
+        # Bind the actions to locals so the loop compares without global/enum lookups
+        BUY, SELL, HOLD = MarketAction.BUY, MarketAction.SELL, MarketAction.HOLD
+        
+        # Simulate trading
+        for i, single_date in enumerate(pbar):
+            try:
+                # Use the generate_signal method to get the trading decision for the current date
+                decision = strategy.generate_signal(symbol, date=single_date, position=position, cash=cash)
+                
+                if decision.action == BUY and cash >= decision.price * decision.quantity:
+                    cash -= decision.price * decision.quantity
+                    position += decision.quantity
+                elif decision.action == SELL and position >= decision.quantity:
+                    cash += decision.price * decision.quantity
+                    position -= decision.quantity
+                
+                # Calculate current portfolio value
+                portfolio_value = cash + position * decision.price
+                portfolio_values[k] = portfolio_value
+                stock_prices[k] = decision.price
+                dates[k] = single_date
+                k += 1
+                
+                # Update progress bar description every few days and on trades; tqdm redraws on each call
+                if i % 20 == 0 or decision.action != HOLD:
+                    profit = portfolio_value - initial_cash
+                    pbar.set_postfix({
+                        'Date': single_date.date().isoformat(),
+                        'Position': position,
+                        'Profit': f'${profit:.2f}'
+                    })
+            except Exception as e:
+                errors.append((single_date, e))
+                continue
+    
+    if errors:
+        print("\n".join(f"Error on {d}: {e}" for d, e in errors))
+    
+    # Keep only the days that produced a decision
+    dates = dates[:k]
+    portfolio_values = portfolio_values[:k]
+    stock_prices = stock_prices[:k]
+    
+    # Create a DataFrame for portfolio values and stock prices, with both
+    # series normalized to start at 100%, in a single constructor call
     portfolio_df = pd.DataFrame(data={
         'Date': dates,
         'Portfolio Value': portfolio_values,
-        'Stock Price': stock_prices
+        'Stock Price': stock_prices,
+        'Portfolio Value %': portfolio_values / portfolio_values[0] * 100,
+        'Stock Price %': stock_prices / stock_prices[0] * 100
     })
     
-    # Normalize both series to start at 100%
-    initial_portfolio = portfolio_df['Portfolio Value'].iloc[0]
-    initial_stock = portfolio_df['Stock Price'].iloc[0]
-    
-    portfolio_df['Portfolio Value %'] = (portfolio_df['Portfolio Value'] / initial_portfolio) * 100
-    portfolio_df['Stock Price %'] = (portfolio_df['Stock Price'] / initial_stock) * 100
-    
-    # Calculate metrics
-    returns_series = pd.Series(daily_returns)
-    market_returns_series = pd.Series(market_returns)
-    
-    # Verify lengths match
-    if len(returns_series) != len(market_returns_series):
-        print(f"Warning: Returns series lengths don't match: {len(returns_series)} vs {len(market_returns_series)}")
-        # Trim to same length if necessary
-        min_length = min(len(returns_series), len(market_returns_series))
-        returns_series = returns_series[:min_length]
-        market_returns_series = market_returns_series[:min_length]
+    # Daily strategy returns and market returns (using stock price as market proxy),
+    # both derived from the same days so they are always aligned
+    returns_series = np.diff(portfolio_values) / portfolio_values[:-1]
+    market_returns_series = np.diff(stock_prices) / stock_prices[:-1]
     
     # Calculate all metrics
-    sharpe_ratio = calculate_sharpe_ratio(returns_series)
+    metrics = compute_all_metrics(returns_series, market_returns_series)
+    sharpe_ratio = metrics['sharpe_ratio']
     max_dd, max_dd_duration = calculate_max_drawdown(portfolio_values)
-    beta = calculate_beta(returns_series, market_returns_series)
-    alpha = calculate_alpha(returns_series, market_returns_series)
-    win_rate = calculate_win_rate(returns_series)
-    profit_factor = calculate_profit_factor(returns_series)
+    beta = metrics['beta']
+    alpha = metrics['alpha']
+    win_rate = metrics['win_rate']
+    profit_factor = metrics['profit_factor']
     
     # Create metrics text
-    metrics_text = f"""Performance Metrics for {STRATEGY.__name__}:
+    metrics_text = f"""Performance Metrics for {strategy_name}:
 
 Sharpe Ratio: {sharpe_ratio:.2f}
     > 1.0: Good | > 2.0: Very Good | > 3.0: Excellent
@@ -184,21 +286,56 @@ Profit Factor: {profit_factor:.2f}
     
     # Print metrics to console and save to file
     print(metrics_text)
-    save_metrics_to_file(metrics_text, STRATEGY.__name__)
+    save_metrics_to_file(metrics_text, strategy_name, symbol)
     
     # Plot the results using the helper function
-    plot_backtest_results(portfolio_df, STRATEGY.__name__, SYMBOL)
+    plot_backtest_results(portfolio_df, strategy_name, symbol)
+    
+    metrics['max_drawdown'] = max_dd
+    metrics['max_drawdown_duration'] = max_dd_duration
+    return metrics
+
+def _run_backtest(strategy_cls, symbol: str) -> dict:
+    """Worker entry point: build the strategy inside the process and backtest it"""
+    strategy = create_strategy(strategy_cls)
+    return backtest_strategy(strategy, symbol, strategy_cls.__name__, show_progress=False)
+
+def run_matrix(strategies: list, symbols: list, max_workers: int = None) -> dict:
+    """
+    Backtest every (strategy, symbol) pair in parallel worker processes
+    Args:
+        strategies: Strategy classes to backtest
+        symbols: Stock ticker symbols to backtest each strategy on
+        max_workers: Number of worker processes (default: number of CPUs)
+    Returns:
+        Dict mapping (strategy name, symbol) to its metrics dict
+    """
+    ensure_directories()
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(_run_backtest, strategy_cls, symbol): (strategy_cls.__name__, symbol)
+            for strategy_cls in strategies
+            for symbol in symbols
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Backtests", dynamic_ncols=True):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                print(f"Backtest of {key[0]} on {key[1]} failed: {e}")
+    return results
 
 def ensure_directories():
     """Create necessary directories if they don't exist"""
     os.makedirs("result_backtest/plots", exist_ok=True)
     os.makedirs("result_backtest/metrics", exist_ok=True)
 
-def save_metrics_to_file(metrics_text: str, strategy_name: str):
+def save_metrics_to_file(metrics_text: str, strategy_name: str, symbol: str):
     """Save metrics to a text file"""
-    filename = f"result_backtest/metrics/{SYMBOL}_{strategy_name}_metrics.txt"
+    filename = f"result_backtest/metrics/{symbol}_{strategy_name}_metrics.txt"
     with open(filename, 'w') as f:
-        f.write(f"Symbol: {SYMBOL}\n\n{metrics_text}")
+        f.write(f"Symbol: {symbol}\n\n{metrics_text}")
     print(f"Metrics saved to {filename}")
 
 if __name__ == '__main__':
@@ -206,25 +343,7 @@ if __name__ == '__main__':
     ensure_directories()
     
     # Initialize the strategy
-    if STRATEGY == BuyAndHoldStrategy:
-        strategy = BuyAndHoldStrategy(api_key=config.API_KEY, api_secret=config.SECRET_KEY)
-        print("Backtesting Buy and Hold strategy")
-    elif STRATEGY == SMAStrategy:
-        strategy = SMAStrategy(api_key=config.API_KEY, api_secret=config.SECRET_KEY)
-        print("Backtesting SMA strategy")
-    elif STRATEGY == MACDStrategy:
-        strategy = MACDStrategy(api_key=config.API_KEY, api_secret=config.SECRET_KEY)
-        print("Backtesting MACD strategy")
-    elif STRATEGY == KDJStrategy:
-        strategy = KDJStrategy(api_key=config.API_KEY, api_secret=config.SECRET_KEY)
-        print("Backtesting KDJ strategy")
-    elif STRATEGY == EnhancedMACDStrategy:
-        strategy = EnhancedMACDStrategy(api_key=config.API_KEY, api_secret=config.SECRET_KEY)
-        print("Backtesting EnhancedMACD strategy")
-    elif STRATEGY == QuantitativeAdaptiveStrategy:
-        strategy = QuantitativeAdaptiveStrategy(api_key=config.API_KEY, api_secret=config.SECRET_KEY)
-        print("Backtesting QuantitativeAdaptive strategy")
-    else:
-        raise ValueError(f"Unsupported strategy: {STRATEGY}")
+    strategy = create_strategy(STRATEGY)
+    print(f"Backtesting {STRATEGY.__name__} strategy")
     
-    backtest_strategy(strategy)
+    backtest_strategy(strategy, SYMBOL, STRATEGY.__name__)
@@ -0,0 +1,134 @@
+"""
+Offline parameter calibration: indicators evaluated over whole grids of
+parameters, e.g. to choose QuantitativeAdaptive's RSI and Bollinger settings.
+Strategies don't import this module, and the compiled sweeps are only built
+on first use.
+"""
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from itertools import product
+from utils._njit import njit, prange
+
+
+def _parameter_sweep(apply_func):
+    # Compiled loop running apply_func once per parameter combination, one combination per thread
+    @njit(parallel=True)
+    def sweep(inputs, params, out):
+        for k in prange(params.shape[0]):
+            apply_func(inputs, params[k], out[k])
+    return sweep
+
+
+class IndicatorFactory:
+    """
+    Indicator evaluated over every combination of its parameters in one
+    compiled pass, like vectorbt's IndicatorFactory
+    """
+
+    def __init__(self, input_names, param_names, output_names):
+        self.input_names = tuple(input_names)
+        self.param_names = tuple(param_names)
+        self.output_names = tuple(output_names)
+        self._sweep = None
+
+    def from_apply_func(self, apply_func):
+        """
+        Use an @njit kernel for one parameter combination.
+        Args:
+            apply_func: Called as apply_func(inputs, params, out) with inputs of
+                shape (len(input_names), n_bars), params a float64 array in
+                param_names order and out of shape (len(output_names), n_bars)
+                to fill in place
+        Returns:
+            The factory itself
+        """
+        self._sweep = _parameter_sweep(apply_func)
+        return self
+
+    def run(self, *inputs, **params) -> dict:
+        """
+        Evaluate the indicator for the cartesian product of the parameter values.
+        Args:
+            inputs: pandas Series or arrays in input_names order, oldest first
+            params: Value or list of values for each name in param_names
+        Returns:
+            Dict of output name to a DataFrame with one column per parameter
+            combination, indexed like the first input if it is a Series
+        """
+        values = [np.atleast_1d(params[name]) for name in self.param_names]
+        combos = list(product(*values))
+        grid = np.array(combos, dtype=np.float64).reshape(len(combos), len(self.param_names))
+        data = np.stack([np.asarray(x, dtype=np.float64) for x in inputs])
+        n = data.shape[1]
+        out = np.full((len(combos), len(self.output_names), n), np.nan)
+        self._sweep(data, grid, out)
+
+        if len(self.param_names) == 1:
+            columns = pd.Index([combo[0] for combo in combos], name=self.param_names[0])
+        else:
+            columns = pd.MultiIndex.from_tuples(combos, names=self.param_names)
+        index = inputs[0].index if isinstance(inputs[0], pd.Series) else None
+        return {name: pd.DataFrame(out[:, j, :].T, index=index, columns=columns)
+                for j, name in enumerate(self.output_names)}
+
+
+@njit(cache=True)
+def _rsi_apply(inputs, params, out):
+    # RSI with Wilder's smoothing, like indicators._adaptive_indicators
+    close = inputs[0]
+    length = int(params[0])
+    decay = 1.0 - 1.0 / length
+    gain_sum = 0.0
+    loss_sum = 0.0
+    for i in range(1, close.shape[0]):
+        change = close[i] - close[i - 1]
+        gain_sum = gain_sum * decay + (change if change > 0 else 0.0)
+        loss_sum = loss_sum * decay + (-change if change < 0 else 0.0)
+        if i >= length and gain_sum + loss_sum > 0:
+            out[0, i] = 100.0 * gain_sum / (gain_sum + loss_sum)
+
+
+@njit(cache=True)
+def _bbands_apply(inputs, params, out):
+    # Bollinger Bands from the SMA and population std over the window, like indicators._adaptive_indicators
+    close = inputs[0]
+    length = int(params[0])
+    std = params[1]
+    window_sum = 0.0
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(close.shape[0]):
+        c = close[i]
+        window_sum += c
+        if i < length:
+            count += 1
+            delta = c - mean
+            mean += delta / count
+            m2 += delta * (c - mean)
+        else:
+            old = close[i - length]
+            window_sum -= old
+            prev_mean = mean
+            mean += (c - old) / length
+            m2 += (c - old) * (c - mean + old - prev_mean)
+        if i < length - 1:
+            continue
+        mid = window_sum / length
+        deviation = std * np.sqrt(max(m2, 0.0) / length)
+        out[0, i] = mid - deviation
+        out[1, i] = mid
+        out[2, i] = mid + deviation
+
+
+@lru_cache(maxsize=None)
+def rsi_factory() -> IndicatorFactory:
+    """RSI sweep, e.g. rsi_factory().run(close, length=[7, 14, 21, 28])['rsi']"""
+    return IndicatorFactory(['close'], ['length'], ['rsi']).from_apply_func(_rsi_apply)
+
+
+@lru_cache(maxsize=None)
+def bbands_factory() -> IndicatorFactory:
+    """Bollinger Bands sweep, e.g. bbands_factory().run(close, length=[10, 20], std=[2.0, 2.5])['lower']"""
+    return IndicatorFactory(['close'], ['length', 'std'], ['lower', 'mid', 'upper']).from_apply_func(_bbands_apply)
@@ -0,0 +1,35 @@
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from alpaca.data.historical import StockHistoricalDataClient
+from alpaca.trading.client import TradingClient
+
+# Connections kept alive per host in each client's HTTP session
+POOL_SIZE = 32
+
+
+def _pool_connections(client, pool_size: int):
+    # alpaca-py clients hold a requests.Session; widen its connection pool so
+    # concurrent requests through a shared client reuse kept-alive connections
+    session = getattr(client, '_session', None)
+    if session is not None:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+
+
+@lru_cache(maxsize=None)
+def make_clients(api_key: str, api_secret: str):
+    """
+    Create the Alpaca data and trading clients for a set of credentials once per
+    process, so every strategy using the same credentials shares their HTTP
+    sessions (and the bars memoized per client in data_cache)
+    Args:
+        api_key: Alpaca API key
+        api_secret: Alpaca API secret
+    Returns:
+        Tuple of (StockHistoricalDataClient, TradingClient)
+    """
+    data_client = StockHistoricalDataClient(api_key, api_secret)
+    trading_client = TradingClient(api_key, api_secret)
+    _pool_connections(data_client, POOL_SIZE)
+    _pool_connections(trading_client, POOL_SIZE)
+    return data_client, trading_client
@@ -0,0 +1,356 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import attrgetter
+from alpaca.data.historical import StockHistoricalDataClient
+from alpaca.data.requests import StockBarsRequest
+from alpaca.data.timeframe import TimeFrame
+
+# Directory for bars persisted across runs, one parquet file of whole days per symbol
+CACHE_DIR = 'result_backtest/cache'
+
+# Most symbols Alpaca accepts in one bars request
+MAX_SYMBOLS_PER_REQUEST = 200
+
+# Most (client, symbol) bar windows kept in memory by get_bars
+COVERING_CACHE_SIZE = 512
+
+# Days past the requested end loaded whenever a symbol's window is extended,
+# so a backtest stepping one day at a time loads bars in chunks
+PREFETCH_DAYS = 30
+
+# Bar fields kept as columns, in the order of BarSet.df
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'trade_count', 'vwap')
+_bar_values = attrgetter(*BAR_COLUMNS)
+
+
+def _to_utc(date: datetime) -> pd.Timestamp:
+    # Alpaca treats naive datetimes as UTC
+    date = pd.Timestamp(date)
+    return date.tz_localize('UTC') if date.tzinfo is None else date.tz_convert('UTC')
+
+
+@lru_cache(maxsize=None)
+def _bars_request_template() -> StockBarsRequest:
+    # Validated once; each request is a copy with its symbols and window swapped in
+    return StockBarsRequest(symbol_or_symbols=[], timeframe=TimeFrame.Day)
+
+
+def _request_bars(client: StockHistoricalDataClient, symbol, start: datetime, end: datetime) -> pd.DataFrame:
+    # `symbol` may also be a list of symbols, fetched in one request.
+    # model_copy skips pydantic validation, including the request's own conversion
+    # of aware datetimes to naive UTC, so the window is converted here
+    request_params = _bars_request_template().model_copy(update={
+        'symbol_or_symbols': symbol,
+        'start': _to_utc(start).tz_localize(None).to_pydatetime(),
+        'end': _to_utc(end).tz_localize(None).to_pydatetime()
+    })
+    return _bars_frame(client.get_stock_bars(request_params))
+
+
+def _bars_frame(barset) -> pd.DataFrame:
+    """
+    Build the same (symbol, timestamp)-indexed frame as BarSet.df, parsing the
+    Bar models straight into one preallocated float64 block instead of going
+    through a dict per row. Missing trade_count/vwap become NaN.
+    """
+    n = sum(len(bars) for bars in barset.data.values())
+    if n == 0:
+        return pd.DataFrame()
+    values = np.empty((n, len(BAR_COLUMNS)), dtype=np.float64)
+    symbols = np.empty(n, dtype=object)
+    timestamps = []
+    i = 0
+    for symbol, bars in barset.data.items():
+        symbols[i:i + len(bars)] = symbol
+        for bar in bars:
+            values[i] = _bar_values(bar)
+            timestamps.append(bar.timestamp)
+            i += 1
+    index = pd.MultiIndex.from_arrays([symbols, pd.DatetimeIndex(timestamps)], names=['symbol', 'timestamp'])
+    return pd.DataFrame(values, index=index, columns=list(BAR_COLUMNS))
+
+
+def _cached_files(symbol: str) -> list:
+    """
+    The parquet windows cached for a symbol, as (first day, last day, path).
+    Normally there is one, replaced by a wider file whenever it is extended;
+    concurrent writers can briefly leave a few.
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return []
+    files = []
+    for filename in os.listdir(CACHE_DIR):
+        if not filename.startswith(symbol + '_') or not filename.endswith('.parquet'):
+            continue
+        # Skip files not named SYMBOL_start_end with two YYYY-MM-DD dates
+        parts = filename[:-len('.parquet')].rsplit('_', 2)
+        if len(parts) != 3 or parts[0] != symbol:
+            continue
+        try:
+            first_day = pd.Timestamp(datetime.strptime(parts[1], '%Y-%m-%d'), tz='UTC')
+            last_day = pd.Timestamp(datetime.strptime(parts[2], '%Y-%m-%d'), tz='UTC')
+        except ValueError:
+            continue
+        files.append((first_day, last_day, os.path.join(CACHE_DIR, filename)))
+    return files
+
+
+def _read_cached(path: str):
+    # None when the file can't be read: no parquet engine, or removed or
+    # corrupted by another process. Callers treat that as a miss
+    try:
+        return pd.read_parquet(path)
+    except Exception:
+        return None
+
+
+def _write_cached(symbol: str, first_day: pd.Timestamp, last_day: pd.Timestamp, bars: pd.DataFrame, files: list):
+    """
+    Persist the bars of whole days [first_day, last_day] and remove the files
+    they supersede. The file is written under a temporary name and renamed into
+    place, so other processes (see backtesting.run_matrix) never read a partial file.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        bars.to_parquet(tmp_path, compression='zstd')
+        os.replace(tmp_path, os.path.join(CACHE_DIR, f"{symbol}_{first_day:%Y-%m-%d}_{last_day:%Y-%m-%d}.parquet"))
+    except ImportError:
+        # No parquet engine installed: skip persisting
+        os.remove(tmp_path)
+        return
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    for cached_first, cached_last, path in files:
+        if first_day <= cached_first and cached_last <= last_day and (cached_first, cached_last) != (first_day, last_day):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Already superseded and removed by another process
+                pass
+
+
+def _load_bars(client: StockHistoricalDataClient, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+    """
+    Load bars from the symbol's parquet window, fetching only the whole days
+    it is missing and persisting the extended window on a miss.
+    Windows reaching today are always fetched, as the latest bar may still change.
+    """
+    start_utc, end_utc = _to_utc(start), _to_utc(end)
+    if end_utc >= pd.Timestamp.now(tz='UTC').normalize():
+        return _request_bars(client, symbol, start, end)
+
+    day_start = start_utc.normalize()
+    day_end = end_utc.normalize()
+    files = _cached_files(symbol)
+    bars = None
+    for first_day, last_day, path in files:
+        if first_day <= day_start and last_day >= day_end:
+            bars = _read_cached(path)
+            if bars is not None:
+                break
+
+    if bars is None:
+        # Extend the widest readable window with the days it is missing, spanning
+        # every other window of the symbol too so the new file supersedes them all
+        for first_day, last_day, _ in files:
+            day_start, day_end = min(day_start, first_day), max(day_end, last_day)
+        cached = None
+        for first_day, last_day, path in sorted(files, key=lambda f: f[1] - f[0], reverse=True):
+            cached = _read_cached(path)
+            if cached is not None:
+                break
+        if cached is None:
+            bars = _request_bars(client, symbol, day_start, day_end + timedelta(days=1))
+        else:
+            parts = [cached]
+            if day_start < first_day:
+                parts.insert(0, _request_bars(client, symbol, day_start, first_day - timedelta(seconds=1)))
+            if day_end > last_day:
+                parts.append(_request_bars(client, symbol, last_day + timedelta(days=1), day_end + timedelta(days=1)))
+            parts = [part for part in parts if len(part) > 0]
+            bars = pd.concat(parts) if len(parts) > 1 else (parts[0] if parts else pd.DataFrame())
+        if len(bars) > 0:
+            _write_cached(symbol, day_start, day_end, bars, files)
+
+    if len(bars) == 0:
+        return bars
+    # Slice the cached superset down to the requested window
+    timestamps = bars.index.get_level_values(1)
+    return bars[(timestamps >= start_utc) & (timestamps <= end_utc)]
+
+
+# (client, symbol) -> (first day, last day, bars, timestamps) of the whole days
+# loaded so far, oldest first; least recently used first
+_covering = OrderedDict()
+_covering_lock = threading.Lock()
+
+
+def _load_days(client: StockHistoricalDataClient, symbol: str, first_day: pd.Timestamp, last_day: pd.Timestamp) -> pd.DataFrame:
+    # Whole days [first_day, last_day] through the parquet cache
+    return _load_bars(client, symbol, first_day, last_day + timedelta(days=1) - pd.Timedelta(1))
+
+
+def _covered_bars(client: StockHistoricalDataClient, symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """
+    Bars for a window lying fully in the past, sliced from the symbol's window
+    in memory. Only the days missing before or after it are loaded, and the
+    window is extended with them.
+    """
+    key = (client, symbol)
+    with _covering_lock:
+        entry = _covering.get(key)
+        if entry is not None:
+            _covering.move_to_end(key)
+    first_day, last_day = start.normalize(), end.normalize()
+    if entry is None or first_day < entry[0] or last_day > entry[1]:
+        # Read ahead up to yesterday, so the next few windows are already covered
+        prefetch_day = min(last_day + timedelta(days=PREFETCH_DAYS),
+                           pd.Timestamp.now(tz='UTC').normalize() - timedelta(days=1))
+        if entry is None:
+            parts = [_load_days(client, symbol, first_day, prefetch_day)]
+            last_day = prefetch_day
+        else:
+            parts = [entry[2]]
+            if first_day < entry[0]:
+                parts.insert(0, _load_days(client, symbol, first_day, entry[0] - timedelta(days=1)))
+            if last_day > entry[1]:
+                parts.append(_load_days(client, symbol, entry[1] + timedelta(days=1), prefetch_day))
+                last_day = prefetch_day
+            else:
+                last_day = entry[1]
+            first_day = min(first_day, entry[0])
+        parts = [part for part in parts if len(part) > 0]
+        bars = pd.concat(parts) if len(parts) > 1 else (parts[0] if parts else pd.DataFrame())
+        timestamps = bars.index.get_level_values(1) if len(bars) > 0 else pd.DatetimeIndex([], tz='UTC')
+        entry = (first_day, last_day, bars, timestamps)
+        with _covering_lock:
+            _covering[key] = entry
+            _covering.move_to_end(key)
+            if len(_covering) > COVERING_CACHE_SIZE:
+                _covering.popitem(last=False)
+
+    _, _, bars, timestamps = entry
+    if len(bars) == 0:
+        return pd.DataFrame()
+    return bars.iloc[timestamps.searchsorted(start, side='left'):
+                     timestamps.searchsorted(end, side='right')].copy()
+
+
+def get_bars(client: StockHistoricalDataClient, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+    """
+    Fetch daily bars for a symbol. Windows lying fully in the past are sliced
+    from one growing window of whole days kept per (client, symbol), so a
+    backtest stepping through dates only loads the days it has not seen yet;
+    those days are persisted to parquet under CACHE_DIR. Windows reaching
+    today are fetched on every call, as the latest bar may still change.
+    Args:
+        client: Alpaca historical data client
+        symbol: Stock ticker symbol
+        start: Start of the requested window
+        end: End of the requested window
+    Returns:
+        A copy of the bars DataFrame, so callers are free to add columns
+    """
+    start_utc, end_utc = _to_utc(start), _to_utc(end)
+    if end_utc < pd.Timestamp.now(tz='UTC').normalize():
+        return _covered_bars(client, symbol, start_utc, end_utc)
+    return _load_bars(client, symbol, start, end)
+
+
+def clear_cache():
+    """
+    Drop the bar windows kept in memory by get_bars, e.g. to release them
+    between backtests. They only hold whole past days, which don't change, so
+    this is never needed for fresh bars.
+    """
+    with _covering_lock:
+        _covering.clear()
+
+
+class BarCache:
+    """
+    Daily bars for a set of symbols, fetched with one multi-symbol request per
+    window instead of one request per symbol. Meant to be shared between the
+    strategies of a multi-symbol backtest: symbols registered before the first
+    get() are fetched together, and when a later get() extends the window the
+    extension is fetched for all registered symbols at once.
+    Bars are not refreshed once fetched, so call clear() in live use.
+    """
+    def __init__(self, client: StockHistoricalDataClient, symbols=()):
+        self._client = client
+        self._symbols = list(dict.fromkeys(symbols))
+        self._loaded = set()
+        self._bars = {}
+        self._start = None
+        self._end = None
+        # Strategies may call get() from several threads (see strategy._parallel)
+        self._lock = threading.Lock()
+
+    def register(self, symbol: str):
+        """Include a symbol in the batched requests"""
+        if symbol not in self._symbols:
+            self._symbols.append(symbol)
+
+    def get(self, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+        """
+        Daily bars for a symbol within [start, end], in the same shape as get_bars
+        Args:
+            symbol: Stock ticker symbol, registered on first use
+            start: Start of the requested window
+            end: End of the requested window
+        Returns:
+            A new DataFrame with the symbol's bars in the window
+        """
+        start_utc, end_utc = _to_utc(start), _to_utc(end)
+        with self._lock:
+            self.register(symbol)
+            self._ensure(start_utc, end_utc)
+            bars = self._bars.get(symbol)
+        if bars is None:
+            return pd.DataFrame()
+        timestamps = bars.index.get_level_values(1)
+        return bars[(timestamps >= start_utc) & (timestamps <= end_utc)]
+
+    def clear(self):
+        """Drop all fetched bars"""
+        with self._lock:
+            self._loaded.clear()
+            self._bars.clear()
+            self._start = self._end = None
+
+    def _ensure(self, start: pd.Timestamp, end: pd.Timestamp):
+        # Fetch whatever part of [start, end] is missing, for every registered symbol
+        if self._start is None:
+            self._store(self._symbols, start, end)
+            self._start, self._end = start, end
+            return
+        missing = [symbol for symbol in self._symbols if symbol not in self._loaded]
+        if missing:
+            self._store(missing, self._start, self._end)
+        if start < self._start:
+            self._store(self._symbols, start, self._start - timedelta(seconds=1))
+            self._start = start
+        if end > self._end:
+            self._store(self._symbols, self._end + timedelta(seconds=1), end)
+            self._end = end
+
+    def _store(self, symbols, start: pd.Timestamp, end: pd.Timestamp):
+        for i in range(0, len(symbols), MAX_SYMBOLS_PER_REQUEST):
+            batch = symbols[i:i + MAX_SYMBOLS_PER_REQUEST]
+            bars = _request_bars(self._client, batch, start, end)
+            if len(bars) > 0:
+                # Split the multi-symbol frame by symbol, keeping the (symbol, timestamp) index
+                for symbol, symbol_bars in bars.groupby(level=0, sort=False):
+                    cached = self._bars.get(symbol)
+                    self._bars[symbol] = (symbol_bars if cached is None
+                                          else pd.concat([cached, symbol_bars]).sort_index())
+            self._loaded.update(batch)
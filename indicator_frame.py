@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from datetime import datetime
+from indicators import _macd_rsi_sma_series
+
+
+@dataclass
+class IndicatorFrame:
+    """
+    Struct-of-arrays view of a symbol's bars and their MACD, signal line, RSI
+    and SMA: one contiguous float64 array per field, aligned with `times`.
+    Strategies index these arrays directly instead of reading indicator
+    columns from a bars DataFrame.
+    """
+    times: pd.DatetimeIndex
+    close: np.ndarray
+    macd: np.ndarray
+    signal: np.ndarray
+    rsi: np.ndarray
+    sma: np.ndarray
+
+    @classmethod
+    def from_closes(cls, close, times=None, fast=12, slow=26, signal=9, rsi_period=14, sma_period=50):
+        """
+        Compute every indicator over the closes with the fused kernel
+        Args:
+            close: Array of closes, oldest first
+            times: Bar timestamps aligned with close
+            fast, slow, signal: MACD EMA lengths
+            rsi_period: RSI length
+            sma_period: SMA length
+        """
+        close = np.ascontiguousarray(close, dtype=np.float64)
+        n = close.shape[0]
+        macd = np.empty(n, dtype=np.float64)
+        sig = np.empty(n, dtype=np.float64)
+        rsi = np.empty(n, dtype=np.float64)
+        sma = np.empty(n, dtype=np.float64)
+        _macd_rsi_sma_series(close, fast, slow, signal, rsi_period, sma_period, macd, sig, rsi, sma)
+        return cls(times=times, close=close, macd=macd, signal=sig, rsi=rsi, sma=sma)
+
+    @classmethod
+    def from_bars(cls, bars: pd.DataFrame, fast=12, slow=26, signal=9, rsi_period=14, sma_period=50):
+        """Build the frame from a (symbol, timestamp)-indexed bars DataFrame"""
+        return cls.from_closes(bars['close'].to_numpy(dtype=np.float64), bars.index.get_level_values(1),
+                               fast, slow, signal, rsi_period, sma_period)
+
+    def locate(self, dates) -> np.ndarray:
+        """
+        Index of the last bar at or before each date, -1 where there is none.
+        Naive dates are treated as UTC, like the bar timestamps.
+        """
+        dates = pd.DatetimeIndex(dates)
+        if dates.tz is None:
+            dates = dates.tz_localize('UTC')
+        return self.times.searchsorted(dates, side='right') - 1
+
+    def index_at(self, date: datetime) -> int:
+        """Index of the last bar at or before a single date, -1 if there is none"""
+        return int(self.locate([date])[0])
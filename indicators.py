@@ -0,0 +1,534 @@
+import numpy as np
+import pandas as pd
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from utils._njit import njit, prange
+
+@njit(cache=True)
+def _macd_rsi_sma_series(close, fast, slow, signal, rsi_period, sma_period,
+                         macd_out, signal_out, rsi_out, sma_out):
+    """
+    MACD, signal line, RSI and SMA for every bar in a single pass over the
+    closes, written into the preallocated output arrays. Matches pandas_ta's
+    macd, rsi and sma: EMAs are seeded with the SMA of their first `length`
+    values, the signal line is an EMA of MACD from its first valid value, and
+    RSI uses Wilder's smoothing as an adjusted EWM with alpha = 1 / rsi_period.
+    Bars without enough history are NaN.
+    Args:
+        close: Contiguous float64 array of closes, oldest first
+        fast, slow, signal: MACD EMA lengths
+        rsi_period: RSI length
+        sma_period: SMA length
+        macd_out, signal_out, rsi_out, sma_out: Arrays of the same length as close
+    Returns:
+        Tuple (ema_fast, ema_slow, gain_sum, loss_sum) at the last bar, where
+        gain_sum and loss_sum are the unnormalized Wilder sums RSI is the ratio of
+    """
+    n = close.shape[0]
+    alpha_fast = 2.0 / (fast + 1)
+    alpha_slow = 2.0 / (slow + 1)
+    alpha_signal = 2.0 / (signal + 1)
+    decay_rsi = 1.0 - 1.0 / rsi_period
+    macd_start = max(fast, slow) - 1
+
+    ema_fast = np.nan
+    ema_slow = np.nan
+    sum_fast = 0.0
+    sum_slow = 0.0
+    sig = np.nan
+    sum_signal = 0.0
+    gain_sum = 0.0
+    loss_sum = 0.0
+    sma_sum = 0.0
+
+    for i in range(n):
+        c = close[i]
+
+        # EMAs seeded with the SMA of their first `length` closes
+        if i < fast:
+            sum_fast += c
+            if i == fast - 1:
+                ema_fast = sum_fast / fast
+        else:
+            ema_fast += alpha_fast * (c - ema_fast)
+        if i < slow:
+            sum_slow += c
+            if i == slow - 1:
+                ema_slow = sum_slow / slow
+        else:
+            ema_slow += alpha_slow * (c - ema_slow)
+
+        # MACD line and its signal EMA, seeded the same way from the first valid MACD
+        macd = np.nan
+        if i >= macd_start:
+            macd = ema_fast - ema_slow
+            j = i - macd_start
+            if j < signal:
+                sum_signal += macd
+                if j == signal - 1:
+                    sig = sum_signal / signal
+            else:
+                sig += alpha_signal * (macd - sig)
+        macd_out[i] = macd
+        signal_out[i] = sig
+
+        # Wilder sums of gains and losses; the EWM weights cancel in the RSI ratio
+        rsi = np.nan
+        if i > 0:
+            change = c - close[i - 1]
+            gain_sum = gain_sum * decay_rsi + (change if change > 0 else 0.0)
+            loss_sum = loss_sum * decay_rsi + (-change if change < 0 else 0.0)
+            if i >= rsi_period and gain_sum + loss_sum > 0:
+                rsi = 100.0 * gain_sum / (gain_sum + loss_sum)
+        rsi_out[i] = rsi
+
+        # Running SMA sum over the last sma_period closes
+        sma_sum += c
+        if i >= sma_period:
+            sma_sum -= close[i - sma_period]
+        sma_out[i] = sma_sum / sma_period if i >= sma_period - 1 else np.nan
+
+    return ema_fast, ema_slow, gain_sum, loss_sum
+
+@njit(cache=True)
+def _macd_rsi_sma_tail(close, fast=12, slow=26, signal=9, rsi_period=14, sma_period=50):
+    """
+    MACD, RSI and SMA over a series of closes, keeping only the values at the
+    last two bars; see _macd_rsi_sma_series.
+    Returns:
+        Tuple (ema_fast, ema_slow, macd_prev, signal_prev, macd, signal,
+        gain_sum, loss_sum, rsi, sma) for the last bar. Values without enough
+        bars are NaN.
+    """
+    n = close.shape[0]
+    macd = np.full(n, np.nan)
+    sig = np.full(n, np.nan)
+    rsi = np.full(n, np.nan)
+    sma = np.full(n, np.nan)
+    ema_fast, ema_slow, gain_sum, loss_sum = _macd_rsi_sma_series(
+        close, fast, slow, signal, rsi_period, sma_period, macd, sig, rsi, sma)
+    last = n - 1
+    prev = n - 2
+    return (ema_fast, ema_slow,
+            macd[prev] if prev >= 0 else np.nan, sig[prev] if prev >= 0 else np.nan,
+            macd[last] if last >= 0 else np.nan, sig[last] if last >= 0 else np.nan,
+            gain_sum, loss_sum,
+            rsi[last] if last >= 0 else np.nan, sma[last] if last >= 0 else np.nan)
+
+def macd_rsi_sma_tail(close, fast=12, slow=26, signal=9, rsi_period=14, sma_period=50):
+    """
+    MACD, RSI and SMA values at the last bar of `close`; see _macd_rsi_sma_tail
+    Args:
+        close: pandas Series or array of closes, oldest first
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    return _macd_rsi_sma_tail(close, fast, slow, signal, rsi_period, sma_period)
+
+@dataclass
+class IndicatorState:
+    """
+    MACD, RSI and SMA at the last processed bar, kept as scalars so a strategy
+    can advance them with each new bar instead of refetching and recomputing
+    the whole lookback window on every signal.
+    """
+    lengths: tuple  # (fast, slow, signal, rsi_period, sma_period)
+    last_bar: pd.Timestamp
+    close: float
+    ema_fast: float
+    ema_slow: float
+    macd: float
+    signal: float
+    prev_macd: float
+    prev_signal: float
+    gain_sum: float
+    loss_sum: float
+    rsi: float
+    sma: float
+    sma_sum: float
+    sma_window: deque
+    n_bars: int
+    end: datetime = None  # Date of the last signal the state was used for
+
+    @classmethod
+    def from_bars(cls, data: pd.DataFrame, fast=12, slow=26, signal=9, rsi_period=14, sma_period=50):
+        """Bootstrap the state from a full lookback window of bars"""
+        close = np.ascontiguousarray(data['close'], dtype=np.float64)
+        ema_fast, ema_slow, prev_macd, prev_signal, macd, sig, gain_sum, loss_sum, rsi, sma = \
+            _macd_rsi_sma_tail(close, fast, slow, signal, rsi_period, sma_period)
+        sma_window = deque(close[-sma_period:].tolist(), maxlen=sma_period)
+        return cls(lengths=(fast, slow, signal, rsi_period, sma_period),
+                   last_bar=data.index.get_level_values(1)[-1], close=close[-1],
+                   ema_fast=ema_fast, ema_slow=ema_slow, macd=macd, signal=sig,
+                   prev_macd=prev_macd, prev_signal=prev_signal,
+                   gain_sum=gain_sum, loss_sum=loss_sum, rsi=rsi, sma=sma,
+                   sma_sum=sum(sma_window), sma_window=sma_window, n_bars=len(close))
+
+    def advance(self, data: pd.DataFrame):
+        """Advance the state over newly fetched bars: ema += alpha * (value - ema)"""
+        fast, slow, signal, rsi_period, sma_period = self.lengths
+        decay_rsi = 1.0 - 1.0 / rsi_period
+        for close in data['close'].to_numpy(dtype=np.float64):
+            self.ema_fast += 2 / (fast + 1) * (close - self.ema_fast)
+            self.ema_slow += 2 / (slow + 1) * (close - self.ema_slow)
+            self.prev_macd, self.prev_signal = self.macd, self.signal
+            self.macd = self.ema_fast - self.ema_slow
+            self.signal += 2 / (signal + 1) * (self.macd - self.signal)
+
+            change = close - self.close
+            self.gain_sum = self.gain_sum * decay_rsi + max(change, 0.0)
+            self.loss_sum = self.loss_sum * decay_rsi + max(-change, 0.0)
+
+            # Running SMA sum: drop the close leaving the window, add the new one
+            if len(self.sma_window) == sma_period:
+                self.sma_sum -= self.sma_window[0]
+            self.sma_window.append(close)
+            self.sma_sum += close
+
+            self.close = close
+            self.n_bars += 1
+
+        total = self.gain_sum + self.loss_sum
+        if self.n_bars - 1 >= rsi_period and total > 0:
+            self.rsi = 100.0 * self.gain_sum / total
+        else:
+            self.rsi = np.nan
+        if len(self.sma_window) == sma_period:
+            self.sma = self.sma_sum / sma_period
+        self.last_bar = data.index.get_level_values(1)[-1]
+
+@njit(cache=True)
+def _rolling_mean(values, length, first, out):
+    # Mean of each `length` window of values[first:]; earlier positions are NaN
+    total = 0.0
+    for i in range(values.shape[0]):
+        out[i] = np.nan
+        if i < first:
+            continue
+        total += values[i]
+        if i >= first + length:
+            total -= values[i - length]
+        if i >= first + length - 1:
+            out[i] = total / length
+
+@njit(cache=True)
+def _stoch_kd(high, low, close, k_period, d_period, smooth_k):
+    """
+    Stochastic %K and %D like pandas_ta's stoch, with the rolling lowest low
+    and highest high from monotonic deques in O(n) instead of rescanning each
+    k_period window. The deques are ring buffers of bar indices whose front is
+    always the extreme of the current window.
+    Args:
+        high, low, close: Contiguous float64 arrays, oldest first
+        k_period: Lookback of the lowest low / highest high
+        d_period: SMA length of %D over %K
+        smooth_k: SMA length smoothing the raw %K
+    Returns:
+        Tuple (k, d) of arrays aligned with close, NaN until enough bars
+    """
+    n = close.shape[0]
+    lowest = np.full(n, np.nan)
+    highest = np.full(n, np.nan)
+    low_idx = np.empty(k_period, dtype=np.int64)
+    high_idx = np.empty(k_period, dtype=np.int64)
+    low_head = 0
+    low_size = 0
+    high_head = 0
+    high_size = 0
+
+    for i in range(n):
+        # Drop the index that just left the window
+        if low_size > 0 and low_idx[low_head] <= i - k_period:
+            low_head = (low_head + 1) % k_period
+            low_size -= 1
+        if high_size > 0 and high_idx[high_head] <= i - k_period:
+            high_head = (high_head + 1) % k_period
+            high_size -= 1
+        # Pop dominated indices from the back, then push this bar
+        while low_size > 0 and low[low_idx[(low_head + low_size - 1) % k_period]] >= low[i]:
+            low_size -= 1
+        low_idx[(low_head + low_size) % k_period] = i
+        low_size += 1
+        while high_size > 0 and high[high_idx[(high_head + high_size - 1) % k_period]] <= high[i]:
+            high_size -= 1
+        high_idx[(high_head + high_size) % k_period] = i
+        high_size += 1
+
+        if i >= k_period - 1:
+            lowest[i] = low[low_idx[low_head]]
+            highest[i] = high[high_idx[high_head]]
+
+    # Like pandas_ta, nudge the whole range by machine epsilon if any of it is zero
+    price_range = highest - lowest
+    for i in range(n):
+        if price_range[i] == 0:
+            price_range += 2.220446049250313e-16
+            break
+    raw_k = 100 * (close - lowest) / price_range
+
+    k = np.empty(n)
+    d = np.empty(n)
+    _rolling_mean(raw_k, smooth_k, k_period - 1, k)
+    _rolling_mean(k, d_period, k_period + smooth_k - 2, d)
+    return k, d
+
+def stoch_kd(high, low, close, k_period=14, d_period=3, smooth_k=3):
+    """
+    Stochastic %K and %D over whole series; see _stoch_kd
+    Args:
+        high, low, close: pandas Series or arrays, oldest first
+    """
+    return _stoch_kd(np.ascontiguousarray(high, dtype=np.float64),
+                     np.ascontiguousarray(low, dtype=np.float64),
+                     np.ascontiguousarray(close, dtype=np.float64),
+                     k_period, d_period, smooth_k)
+
+@njit(cache=True)
+def _non_zero_range(x, y):
+    # x - y in float64, nudged by machine epsilon everywhere if any difference is zero, like pandas_ta
+    diff = np.empty(x.shape[0])
+    nudge = False
+    for i in range(diff.shape[0]):
+        diff[i] = x[i] - y[i]
+        if diff[i] == 0:
+            nudge = True
+    if nudge:
+        diff += 2.220446049250313e-16
+    return diff
+
+# Rows of the output array filled by _adaptive_indicators
+ADAPTIVE_COLUMNS = ('BBL', 'BBM', 'BBU', 'BBB', 'BBP', 'RSI', 'ATR', 'Volume_MA', 'HMA', 'ROC', 'MFI', 'Volatility')
+
+@njit(cache=True)
+def _adaptive_indicators(high, low, close, volume, bb_length, bb_std, rsi_period, atr_period,
+                         volume_ma_period, hma_period, roc_period, mfi_period, volatility_window,
+                         out, work):
+    """
+    Every QuantitativeAdaptiveStrategy indicator in a single forward pass over
+    the bars, keeping all the rolling accumulators side by side instead of
+    traversing the arrays once per indicator. Matches pandas_ta's bbands, rsi,
+    atr, sma, hma, roc and mfi, and close.pct_change().rolling(window).std()
+    for the volatility.
+    Args:
+        high, low, close, volume: Contiguous float64 (or float32) arrays, oldest first;
+            accumulation is float64 either way
+        bb_length, bb_std: Bollinger Bands length and width in standard deviations
+        rsi_period, atr_period, volume_ma_period, hma_period, roc_period,
+        mfi_period, volatility_window: Indicator lengths
+        out: Array of shape (len(ADAPTIVE_COLUMNS), len(close)) filled in place
+            with one row per indicator in ADAPTIVE_COLUMNS order, NaN until
+            enough bars
+        work: Scratch array of shape (4, >= len(close)), overwritten; callers
+            can keep one and reuse it across calls
+    """
+    n = close.shape[0]
+    out[:] = np.nan
+    lower, mid, upper, bandwidth, percent, rsi, atr, volume_ma, hma, roc, mfi, volatility = out
+
+    decay_rsi = 1.0 - 1.0 / rsi_period
+    decay_atr = 1.0 - 1.0 / atr_period
+    half_length = hma_period // 2
+    sqrt_length = int(np.sqrt(hma_period))
+    half_weight = 0.5 * half_length * (half_length + 1)
+    full_weight = 0.5 * hma_period * (hma_period + 1)
+    sqrt_weight = 0.5 * sqrt_length * (sqrt_length + 1)
+
+    # Like pandas_ta, nudge every high - low range by machine epsilon if any is zero
+    high_low_nudge = 0.0
+    for i in range(n):
+        if high[i] - low[i] == 0:
+            high_low_nudge = 2.220446049250313e-16
+            break
+
+    bb_sum = 0.0
+    bb_count = 0
+    bb_mean = 0.0
+    bb_m2 = 0.0
+    gain_sum = 0.0
+    loss_sum = 0.0
+    atr_weighted = 0.0
+    atr_weights = 0.0
+    volume_sum = 0.0
+    half_numerator = 0.0
+    half_sum = 0.0
+    full_numerator = 0.0
+    full_sum = 0.0
+    hull_numerator = 0.0
+    hull_sum = 0.0
+    hull_diff = work[0]
+    typical_price = work[1]
+    positive_flow = work[2]
+    negative_flow = work[3]
+    positive_sum = 0.0
+    negative_sum = 0.0
+    return_count = 0
+    return_mean = 0.0
+    return_m2 = 0.0
+
+    for i in range(n):
+        c = close[i]
+
+        # Bollinger Bands: running SMA, population std from Welford sums of the
+        # window's closes; once the window is full, the close leaving it is
+        # replaced by the new one in a single update
+        bb_sum += c
+        if i < bb_length:
+            bb_count += 1
+            delta = c - bb_mean
+            bb_mean += delta / bb_count
+            bb_m2 += delta * (c - bb_mean)
+        else:
+            old = close[i - bb_length]
+            bb_sum -= old
+            prev_mean = bb_mean
+            bb_mean += (c - old) / bb_length
+            bb_m2 += (c - old) * (c - bb_mean + old - prev_mean)
+        if i >= bb_length - 1:
+            mid[i] = bb_sum / bb_length
+            deviation = bb_std * np.sqrt(max(bb_m2, 0.0) / bb_length)
+            lower[i] = mid[i] - deviation
+            upper[i] = mid[i] + deviation
+
+        # Wilder-smoothed RSI and ATR, from the second bar
+        if i > 0:
+            change = c - close[i - 1]
+            gain_sum = gain_sum * decay_rsi + (change if change > 0 else 0.0)
+            loss_sum = loss_sum * decay_rsi + (-change if change < 0 else 0.0)
+            if i >= rsi_period and gain_sum + loss_sum > 0:
+                rsi[i] = 100.0 * gain_sum / (gain_sum + loss_sum)
+
+            true_range = max(abs(high[i] - low[i] + high_low_nudge),
+                             abs(high[i] - close[i - 1]), abs(close[i - 1] - low[i]))
+            atr_weighted = atr_weighted * decay_atr + true_range
+            atr_weights = atr_weights * decay_atr + 1.0
+            if i >= atr_period:
+                atr[i] = atr_weighted / atr_weights
+
+        # Volume SMA
+        volume_sum += volume[i]
+        if i >= volume_ma_period:
+            volume_sum -= volume[i - volume_ma_period]
+        if i >= volume_ma_period - 1:
+            volume_ma[i] = volume_sum / volume_ma_period
+
+        # Hull MA: WMA over sqrt_length of 2 * WMA(half) - WMA(full). Each WMA
+        # slides in O(1): numerator += length * new value - previous window sum
+        if i < half_length:
+            half_numerator += (i + 1) * c
+            half_sum += c
+        else:
+            half_numerator += half_length * c - half_sum
+            half_sum += c - close[i - half_length]
+        if i < hma_period:
+            full_numerator += (i + 1) * c
+            full_sum += c
+        else:
+            full_numerator += hma_period * c - full_sum
+            full_sum += c - close[i - hma_period]
+        if i >= hma_period - 1:
+            diff = 2 * (half_numerator / half_weight) - full_numerator / full_weight
+            hull_diff[i] = diff
+            k = i - (hma_period - 1)
+            if k < sqrt_length:
+                hull_numerator += (k + 1) * diff
+                hull_sum += diff
+            else:
+                hull_numerator += sqrt_length * diff - hull_sum
+                hull_sum += diff - hull_diff[i - sqrt_length]
+            if k >= sqrt_length - 1:
+                hma[i] = hull_numerator / sqrt_weight
+
+        # Rate of change in percent
+        if i >= roc_period and close[i - roc_period] != 0:
+            roc[i] = 100 * (c - close[i - roc_period]) / close[i - roc_period]
+
+        # Money Flow Index from the raw money flow on rising / falling typical prices
+        typical_price[i] = (high[i] + low[i] + c) / 3.0
+        positive_flow[i] = 0.0
+        negative_flow[i] = 0.0
+        if i > 0:
+            if typical_price[i] > typical_price[i - 1]:
+                positive_flow[i] = typical_price[i] * volume[i]
+            elif typical_price[i] < typical_price[i - 1]:
+                negative_flow[i] = typical_price[i] * volume[i]
+        # Running window sums of the flows, like the rolling sums pandas_ta uses
+        positive_sum += positive_flow[i]
+        negative_sum += negative_flow[i]
+        if i >= mfi_period:
+            positive_sum -= positive_flow[i - mfi_period]
+            negative_sum -= negative_flow[i - mfi_period]
+        if i >= mfi_period - 1:
+            if positive_sum + negative_sum != 0:
+                mfi[i] = 100.0 * positive_sum / (positive_sum + negative_sum)
+
+        # Volatility: Welford update / downdate of the window's daily returns
+        if i > 0:
+            value = c / close[i - 1] - 1
+            return_count += 1
+            delta = value - return_mean
+            return_mean += delta / return_count
+            return_m2 += delta * (value - return_mean)
+            if return_count > volatility_window:
+                old = close[i - volatility_window] / close[i - volatility_window - 1] - 1
+                return_count -= 1
+                delta = old - return_mean
+                return_mean -= delta / return_count
+                return_m2 -= delta * (old - return_mean)
+            if return_count == volatility_window:
+                volatility[i] = np.sqrt(max(return_m2, 0.0) / (volatility_window - 1))
+
+    # Band width and %B, with pandas_ta's zero-range nudges over the whole series
+    band_range = _non_zero_range(upper, lower)
+    bandwidth[:] = 100 * band_range / mid
+    percent[:] = _non_zero_range(close, lower) / band_range
+
+@njit(parallel=True, cache=True)
+def _adaptive_indicators_batch(high, low, close, volume, lengths, bb_length, bb_std, rsi_period,
+                               atr_period, volume_ma_period, hma_period, roc_period, mfi_period,
+                               volatility_window, out, work):
+    """
+    _adaptive_indicators for many symbols at once, one symbol per thread.
+    Args:
+        high, low, close, volume: Arrays of shape (n_symbols, max_bars), each
+            symbol's bars left-aligned, oldest first
+        lengths: Number of bars of each symbol
+        out: Array of shape (n_symbols, len(ADAPTIVE_COLUMNS), max_bars) filled
+            in place; entries past a symbol's length are left untouched
+        work: Scratch array of shape (n_symbols, 4, max_bars)
+        Other arguments as for _adaptive_indicators
+    """
+    for s in prange(close.shape[0]):
+        n = lengths[s]
+        _adaptive_indicators(high[s, :n], low[s, :n], close[s, :n], volume[s, :n],
+                             bb_length, bb_std, rsi_period, atr_period, volume_ma_period,
+                             hma_period, roc_period, mfi_period, volatility_window,
+                             out[s, :, :n], work[s])
+
+class StreamingSMA:
+    """
+    Simple moving average updated one value at a time. The running window sum
+    is Kahan-compensated as values enter and leave, so it does not drift over
+    long streams.
+    """
+    __slots__ = ('length', 'window', 'total', 'compensation')
+
+    def __init__(self, length: int):
+        self.length = length
+        self.window = deque(maxlen=length)
+        self.total = 0.0
+        self.compensation = 0.0
+
+    def _add(self, value: float):
+        # Kahan summation: carry the low-order bits lost by the previous addition
+        y = value - self.compensation
+        total = self.total + y
+        self.compensation = (total - self.total) - y
+        self.total = total
+
+    def update(self, value: float) -> float:
+        """Add the newest value and return the SMA, NaN until the window is full"""
+        if len(self.window) == self.length:
+            self._add(-self.window[0])
+        self.window.append(value)
+        self._add(value)
+        return self.total / self.length if len(self.window) == self.length else np.nan
@@ -12,6 +12,9 @@ class MarketDecision():
     """
     Represents a decision to buy or sell a stock
     """
+    # Created once per signal; slots avoid a per-instance __dict__
+    __slots__ = ('symbol', 'action', 'price', 'quantity')
+
     def __init__(self, symbol: str, action: MarketAction, price: float, quantity: int):
         self.symbol = symbol
         self.action = action
@@ -20,6 +23,33 @@ class MarketDecision():
 
 
 class IStrategy(metaclass=abc.ABCMeta):
+    def prepare(self, symbol='AAPL', start=None, end=None):
+        """
+        Optional hook called once before generating signals for every day in a
+        date range, e.g. by a backtest. Strategies can prefetch data and
+        precompute indicators for the whole range here so that generate_signal
+        does not have to hit the API on every call. The default does nothing.
+        :param symbol: Stock ticker symbol
+        :param start: First date signals will be generated for
+        :param end: Last date signals will be generated for
+        """
+        pass
+
+    def signal_arrays(self, symbol='AAPL', dates=None):
+        """
+        Optional hook for strategies whose signal is a fixed-quantity crossover
+        of two series that prepare() has already computed. Returning the series
+        per date lets a backtest simulate all dates in one compiled pass instead
+        of calling generate_signal for each. The default returns None, meaning
+        generate_signal must be used.
+        :param symbol: Stock ticker symbol
+        :param dates: DatetimeIndex of the dates to simulate
+        :return: None, or a tuple (close, fast, slow, fast_prev, slow_prev, valid, quantity)
+        of arrays aligned with dates, where fast/slow crossing upwards is a buy,
+        crossing downwards is a sell, and days with valid == False have no signal
+        """
+        return None
+
     @abc.abstractmethod
     def generate_signal(self, symbol='AAPL', date=None, position=0, cash=0.0) -> MarketDecision:
         """
@@ -1,24 +1,35 @@
 import numpy as np
+from utils._njit import njit, NUMBA_AVAILABLE
 
 def calculate_sharpe_ratio(returns, risk_free_rate=0.02):
     """
-    Calculate the Sharpe Ratio for a series of returns
+    Calculate the Sharpe Ratio for a series of returns; see compute_all_metrics
     Args:
-        returns: pandas Series of daily returns
+        returns: NumPy array (or array-like) of daily returns
         risk_free_rate: Annual risk-free rate (default 2%)
     """
-    # Convert annual risk-free rate to daily
-    daily_rf = risk_free_rate/252
-    
-    # Calculate excess returns
-    excess_returns = returns - daily_rf
+    return compute_all_metrics(returns, returns, risk_free_rate)['sharpe_ratio']
+
+@njit(cache=True)
+def _max_drawdown_kernel(values):
+    """Single pass over the values keeping the peak and deepest drawdown in scalars"""
+    peak = values[0]
+    peak_idx = 0
+    max_dd = 0.0
+    max_dd_duration = 0
     
-    # Calculate annualized Sharpe Ratio
-    if excess_returns.std() == 0:
-        return 0
+    for i in range(values.shape[0]):
+        value = values[i]
+        if value > peak:
+            peak = value
+            peak_idx = i
+        else:
+            dd = (peak - value) / peak
+            if dd > max_dd:
+                max_dd = dd
+                max_dd_duration = i - peak_idx
     
-    sharpe = np.sqrt(252) * (excess_returns.mean() / excess_returns.std())
-    return sharpe
+    return max_dd, max_dd_duration
 
 def calculate_max_drawdown(portfolio_values):
     """
@@ -29,86 +40,147 @@ def calculate_max_drawdown(portfolio_values):
         max_dd: Maximum drawdown as a percentage
         max_dd_duration: Duration of the maximum drawdown in days
     """
-    peak = portfolio_values[0]
-    max_dd = 0
-    max_dd_duration = 0
-    current_dd_duration = 0
-    peak_idx = 0
+    values = np.ascontiguousarray(portfolio_values, dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        return _max_drawdown_kernel(values)
+    
+    # Running peak and drawdown from it at every point
+    peaks = np.maximum.accumulate(values)
+    drawdowns = (peaks - values) / peaks
+    
+    # Deepest drawdown, and the first point where its peak was reached
+    trough_idx = int(np.argmax(drawdowns))
+    max_dd = float(drawdowns[trough_idx])
+    peak_idx = int(np.argmax(values[:trough_idx + 1]))
+    max_dd_duration = trough_idx - peak_idx
     
-    for i, value in enumerate(portfolio_values):
-        if value > peak:
-            peak = value
-            peak_idx = i
-            current_dd_duration = 0
-        else:
-            current_dd_duration = i - peak_idx
-            dd = (peak - value) / peak
-            if dd > max_dd:
-                max_dd = dd
-                max_dd_duration = current_dd_duration
-                
     return max_dd, max_dd_duration
 
 def calculate_beta(strategy_returns, market_returns):
     """
-    Calculate Beta (market sensitivity) of the strategy
+    Calculate Beta (market sensitivity) of the strategy; see compute_all_metrics
     Args:
-        strategy_returns: pandas Series of strategy returns
-        market_returns: pandas Series of market returns
+        strategy_returns: NumPy array of strategy returns
+        market_returns: NumPy array of market returns
     Returns:
         beta: Strategy's beta coefficient
     """
-    # Calculate covariance between strategy and market returns
-    covariance = np.cov(strategy_returns, market_returns)[0][1]
-    # Calculate market variance
-    market_variance = np.var(market_returns)
-    # Calculate beta
-    return covariance / market_variance if market_variance != 0 else 1.0
+    return compute_all_metrics(strategy_returns, market_returns)['beta']
 
 def calculate_alpha(strategy_returns, market_returns, risk_free_rate=0.02):
     """
-    Calculate Alpha (excess return) of the strategy
+    Calculate Alpha (excess return) of the strategy; see compute_all_metrics
     Args:
-        strategy_returns: pandas Series of strategy returns
-        market_returns: pandas Series of market returns
+        strategy_returns: NumPy array of strategy returns
+        market_returns: NumPy array of market returns
         risk_free_rate: Annual risk-free rate (default 2%)
     Returns:
         alpha: Strategy's alpha (annualized)
     """
-    # Convert annual risk-free rate to daily
-    daily_rf = risk_free_rate/252
-    
-    # Calculate beta
-    beta = calculate_beta(strategy_returns, market_returns)
-    
-    # Calculate annualized returns
-    strategy_return = strategy_returns.mean() * 252
-    market_return = market_returns.mean() * 252
-    
-    # Calculate alpha using CAPM formula
-    alpha = strategy_return - (daily_rf * 252 + beta * (market_return - daily_rf * 252))
-    return alpha
+    return compute_all_metrics(strategy_returns, market_returns, risk_free_rate)['alpha']
 
 def calculate_win_rate(returns):
     """
-    Calculate the win rate (percentage of profitable trades)
+    Calculate the win rate (percentage of profitable trades); see compute_all_metrics
     Args:
-        returns: pandas Series of returns
+        returns: NumPy array of returns
     Returns:
         win_rate: Percentage of winning trades
     """
-    wins = (returns > 0).sum()
-    total = len(returns)
-    return wins / total if total > 0 else 0.0
+    return compute_all_metrics(returns, returns)['win_rate']
 
 def calculate_profit_factor(returns):
     """
-    Calculate the profit factor (gross profits / gross losses)
+    Calculate the profit factor (gross profits / gross losses); see compute_all_metrics
     Args:
-        returns: pandas Series of returns
+        returns: NumPy array of returns
     Returns:
         profit_factor: Ratio of gross profits to gross losses
     """
-    gains = returns[returns > 0].sum()
-    losses = abs(returns[returns < 0].sum())
-    return gains / losses if losses != 0 else float('inf')
+    return compute_all_metrics(returns, returns)['profit_factor']
+
+@njit(cache=True)
+def _fused_moments(r, m):
+    """
+    Single pass over both return series: Welford updates for the means and the
+    centered sums of squares and cross products, plus win and gain/loss tallies
+    """
+    mean_r = 0.0
+    mean_m = 0.0
+    ss_r = 0.0
+    ss_m = 0.0
+    ss_rm = 0.0
+    wins = 0
+    gains = 0.0
+    losses = 0.0
+    
+    for i in range(r.shape[0]):
+        dr = r[i] - mean_r
+        dm = m[i] - mean_m
+        mean_r += dr / (i + 1)
+        mean_m += dm / (i + 1)
+        ss_r += dr * (r[i] - mean_r)
+        ss_m += dm * (m[i] - mean_m)
+        ss_rm += dr * (m[i] - mean_m)
+        if r[i] > 0:
+            wins += 1
+            gains += r[i]
+        elif r[i] < 0:
+            losses -= r[i]
+    
+    if r.shape[0] == 0:
+        mean_r = np.nan
+        mean_m = np.nan
+    return mean_r, mean_m, ss_r, ss_m, ss_rm, wins, gains, losses
+
+def compute_all_metrics(strategy_returns, market_returns, risk_free_rate=0.02):
+    """
+    Calculate Sharpe Ratio, Beta, Alpha, Win Rate and Profit Factor together.
+    This is the one implementation of these metrics; the calculate_* functions
+    return single entries of it. The metrics share the means and centered cross
+    products instead of traversing the returns once per metric; with numba
+    everything comes from a single fused pass.
+    Args:
+        strategy_returns: Array of daily strategy returns
+        market_returns: Array of daily market returns, aligned with strategy_returns
+        risk_free_rate: Annual risk-free rate (default 2%)
+    Returns:
+        Dict with sharpe_ratio, beta, alpha, win_rate and profit_factor
+    """
+    r = np.asarray(strategy_returns, dtype=np.float64)
+    m = np.asarray(market_returns, dtype=np.float64)
+    n = len(r)
+    daily_rf = risk_free_rate/252
+    
+    # Means, centered second moments and win/loss tallies
+    if NUMBA_AVAILABLE:
+        mean_r, mean_m, ss_r, ss_m, ss_rm, wins, gains, losses = _fused_moments(r, m)
+    else:
+        mean_r = r.mean()
+        mean_m = m.mean()
+        dr = r - mean_r
+        dm = m - mean_m
+        ss_r = np.dot(dr, dr)
+        ss_m = np.dot(dm, dm)
+        ss_rm = np.dot(dr, dm)
+        wins = np.count_nonzero(r > 0)
+        gains = r[r > 0].sum()
+        losses = -r[r < 0].sum()
+    std_r = np.sqrt(ss_r / (n - 1)) if n > 1 else np.nan
+    covariance = ss_rm / (n - 1) if n > 1 else np.nan
+    market_variance = ss_m / (n - 1) if n > 1 else np.nan
+    
+    # Sharpe Ratio: subtracting the risk-free rate shifts the mean but not the std
+    sharpe = 0 if std_r == 0 else np.sqrt(252) * ((mean_r - daily_rf) / std_r)
+    
+    # Beta and CAPM Alpha
+    beta = covariance / market_variance if market_variance != 0 else 1.0
+    alpha = mean_r * 252 - (daily_rf * 252 + beta * (mean_m * 252 - daily_rf * 252))
+    
+    return {
+        'sharpe_ratio': sharpe,
+        'beta': beta,
+        'alpha': alpha,
+        'win_rate': wins / n if n > 0 else 0.0,
+        'profit_factor': gains / losses if losses != 0 else float('inf')
+    }
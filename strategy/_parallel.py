@@ -0,0 +1,55 @@
+import threading
+import weakref
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# One lock per (strategy, symbol), so concurrent calls for the same symbol don't
+# interleave updates to a strategy's per-symbol cached state. Keyed weakly by the
+# strategy, so its locks go away with it
+_symbol_locks = weakref.WeakKeyDictionary()
+_symbol_locks_guard = threading.Lock()
+
+
+def _symbol_lock(strategy, symbol: str) -> threading.Lock:
+    with _symbol_locks_guard:
+        locks = _symbol_locks.get(strategy)
+        if locks is None:
+            locks = _symbol_locks[strategy] = defaultdict(threading.Lock)
+        return locks[symbol]
+
+
+def _generate_signal(strategy, symbol, date, position, cash):
+    with _symbol_lock(strategy, symbol):
+        return strategy.generate_signal(symbol, date=date, position=position, cash=cash)
+
+
+def fanout(strategy, symbols, date, positions, cash, max_workers=16):
+    """
+    Generate one day's signals for many symbols concurrently.
+    generate_signal is dominated by waiting on the Alpaca API, which releases
+    the GIL, so threads overlap the round-trips of different symbols.
+    Args:
+        strategy: Strategy instance shared by all symbols
+        symbols: Stock ticker symbols to generate signals for
+        date: Date to generate the signals for
+        positions: Dict of symbol to number of shares held (missing means 0)
+        cash: Available cash passed to every signal
+        max_workers: Maximum number of concurrent requests
+    Returns:
+        decisions: Dict of symbol to MarketDecision
+        errors: List of (symbol, exception) for the symbols that failed
+    """
+    decisions = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_generate_signal, strategy, symbol, date, positions.get(symbol, 0), cash): symbol
+            for symbol in symbols
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                decisions[symbol] = future.result()
+            except Exception as e:
+                errors.append((symbol, e))
+    return decisions, errors
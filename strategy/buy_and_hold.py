@@ -1,10 +1,8 @@
 import pandas as pd
 from datetime import datetime, timedelta
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
-from alpaca.trading.client import TradingClient
 from interface import MarketAction, MarketDecision, IStrategy
+from clients import make_clients
+from data_cache import get_bars
 
 class BuyAndHoldStrategy(IStrategy):
     def __init__(self, api_key: str, api_secret: str):
@@ -13,9 +11,31 @@ class BuyAndHoldStrategy(IStrategy):
         This strategy will buy as many shares as possible with available cash on day one,
         and then hold those shares indefinitely.
         """
-        self._client = StockHistoricalDataClient(api_key, api_secret)
-        self._trading_client = TradingClient(api_key, api_secret)
+        # Clients are shared by every strategy created with the same credentials
+        self._client, self._trading_client = make_clients(api_key, api_secret)
         self._first_trade = True
+        # Per-symbol bars fetched over a whole backtest window by prepare()
+        self._prepared = {}
+
+    def prepare(self, symbol='AAPL', start=None, end=None):
+        """
+        Fetch the bars for the whole [start, end] window, plus the days of slack
+        generate_signal looks around each date, in a single request
+        """
+        bars = get_bars(self._client, symbol, start - timedelta(days=5), end + timedelta(days=1))
+        bars, timestamps = self._sorted(bars)
+        self._prepared[symbol] = {'start': start, 'end': end, 'bars': bars, 'times': timestamps}
+
+    @staticmethod
+    def _sorted(bars: pd.DataFrame):
+        """Bars in time order along with their timestamps, sorting only if needed"""
+        if len(bars) == 0:
+            return bars, None
+        timestamps = bars.index.get_level_values(1)
+        if not timestamps.is_monotonic_increasing:
+            bars = bars.sort_index()
+            timestamps = bars.index.get_level_values(1)
+        return bars, timestamps
 
     def generate_signal(self, symbol='AAPL', date=None, position=0, cash=0.0) -> MarketDecision:
         """
@@ -26,24 +46,22 @@ class BuyAndHoldStrategy(IStrategy):
         if date is None:
             date = datetime.now()
             
-        # Look back a few days to ensure we get data even around weekends/holidays
-        start_date = date - timedelta(days=5)
-        end_date = date + timedelta(days=1)
-        
-        request_params = StockBarsRequest(
-            symbol_or_symbols=symbol,
-            timeframe=TimeFrame.Day,
-            start=start_date,
-            end=end_date
-        )
-        
         try:
-            bars = self._client.get_stock_bars(request_params).df
+            prepared = self._prepared.get(symbol)
+            if prepared is not None and prepared['start'] <= date <= prepared['end']:
+                bars, timestamps = prepared['bars'], prepared['times']
+            else:
+                # Look back a few days to ensure we get data even around weekends/holidays.
+                # Whole days keep repeated calls for the same date on one memoized window
+                day = datetime(date.year, date.month, date.day)
+                bars, timestamps = self._sorted(
+                    get_bars(self._client, symbol, day - timedelta(days=5), day + timedelta(days=2)))
             if len(bars) == 0:
                 raise RuntimeError("No market data available for this date range")
                 
-            # Get the last price up to our target date
-            bars = bars[bars.index.get_level_values(1).date <= date.date()]
+            # Get the last price up to our target date: bars before the next UTC midnight
+            cutoff = pd.Timestamp(date.date() + timedelta(days=1), tz='UTC')
+            bars = bars.iloc[:timestamps.searchsorted(cutoff, side='left')]
             if len(bars) == 0:
                 raise RuntimeError("No market data available up to this date")
                 
@@ -1,11 +1,26 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
-from alpaca.trading.client import TradingClient
-import pandas_ta as ta
 from interface import MarketAction, MarketDecision, IStrategy
+from clients import make_clients
+from data_cache import get_bars, BarCache
+from indicators import IndicatorState
+from indicator_frame import IndicatorFrame
+from utils._njit import njit
+
+@njit(cache=True)
+def _decide(macd_prev, signal_prev, macd, signal, rsi, sma, price, rsi_overbought, rsi_oversold):
+    """
+    Crossover decision from the indicator values alone: 1 to buy, -1 to sell,
+    0 to hold. Cash and position checks are left to the caller.
+    """
+    if macd > signal and macd_prev <= signal_prev:
+        # MACD crossover plus at least one confirmation: not overbought, or above the SMA
+        return 1 if (rsi < rsi_overbought or price > sma) else 0
+    if macd < signal and macd_prev >= signal_prev:
+        # MACD crossunder while either not oversold or below the SMA
+        return -1 if (rsi > rsi_oversold or price < sma) else 0
+    return 0
 
 class EnhancedMACDStrategy(IStrategy):
     def __init__(self, api_key: str, api_secret: str,
@@ -17,87 +32,115 @@ class EnhancedMACDStrategy(IStrategy):
                  rsi_period: int = 14,
                  rsi_overbought: int = 75,
                  rsi_oversold: int = 25,
-                 sma_period: int = 50):
-        self._client = StockHistoricalDataClient(api_key, api_secret)
-        self._trading_client = TradingClient(api_key, api_secret)
+                 sma_period: int = 50,
+                 bar_cache: BarCache = None):
+        # Clients are shared by every strategy created with the same credentials
+        self._client, self._trading_client = make_clients(api_key, api_secret)
+        # Optional cache shared with other strategies to batch bar requests across symbols
+        self._bar_cache = bar_cache
         self._lookback_days = lookback_days
         self._trade_quantity = trade_quantity
         self._macd_params = (macd_fast, macd_slow, macd_signal)
         self._rsi_params = (rsi_period, rsi_overbought, rsi_oversold)
         self._sma_period = sma_period
+        # Per-symbol indicator state so consecutive calls only process new bars
+        self._state = {}
+        # Per-symbol indicator arrays precomputed over a whole backtest window by prepare()
+        self._prepared = {}
 
-    def _calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
-        # Calculate MACD
-        macd = ta.macd(data['close'])
-        if macd is None or pd.isna(macd.iloc[-1]).any():  # Changed from isna() to pd.isna()
-            raise ValueError("Failed to calculate MACD indicators")
-        
-        # Calculate RSI
+    def _fetch_bars(self, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+        if self._bar_cache is not None:
+            return self._bar_cache.get(symbol, start, end)
+        return get_bars(self._client, symbol, start, end)
+
+    def _calculate_indicators(self, data: pd.DataFrame) -> IndicatorState:
+        """
+        Bootstrap MACD, RSI and SMA from a full lookback window of bars in one
+        fused pass over the closes.
+        """
+        macd_fast, macd_slow, macd_signal = self._macd_params
         rsi_period, _, _ = self._rsi_params
-        rsi = ta.rsi(data['close'], length=rsi_period)
-        if rsi is None or pd.isna(rsi.iloc[-1]):  # Changed from isna() to pd.isna()
+        state = IndicatorState.from_bars(data, macd_fast, macd_slow, macd_signal,
+                                         rsi_period, self._sma_period)
+        self._check_indicators(state.macd, state.signal, state.rsi, state.sma)
+        return state
+
+    @staticmethod
+    def _check_indicators(macd: float, signal: float, rsi: float, sma: float):
+        if np.isnan(macd) or np.isnan(signal):
+            raise ValueError("Failed to calculate MACD indicators")
+        if np.isnan(rsi):
             raise ValueError("Failed to calculate RSI indicator")
-        
-        # Calculate 200 SMA
-        sma = ta.sma(data['close'], length=self._sma_period)
-        if sma is None or pd.isna(sma.iloc[-1]):  # Changed from isna() to pd.isna()
+        if np.isnan(sma):
             raise ValueError("Failed to calculate SMA indicator")
-        
-        # Add all indicators to the dataframe
-        data = pd.concat([data, macd, rsi.rename('RSI'), sma.rename('SMA')], axis=1)
-        return data
+
+    def prepare(self, symbol='AAPL', start=None, end=None):
+        """
+        Fetch bars for the whole [start, end] window plus the lookback buffer in
+        a single request and compute MACD, RSI and SMA over all of them once.
+        generate_signal then indexes the arrays for each date.
+        """
+        macd_fast, macd_slow, macd_signal = self._macd_params
+        rsi_period, _, _ = self._rsi_params
+        bars = self._fetch_bars(symbol, start - timedelta(days=self._lookback_days), end)
+        self._prepared[symbol] = {
+            'start': start,
+            'end': end,
+            'frame': IndicatorFrame.from_bars(bars, macd_fast, macd_slow, macd_signal,
+                                              rsi_period, self._sma_period)
+        }
 
     def generate_signal(self, symbol='AAPL', date=None, position=0, cash=0.0) -> MarketDecision:
         if date is None:
             date = datetime.now()
-        start_date = date - timedelta(days=self._lookback_days)
-        
-        request_params = StockBarsRequest(
-            symbol_or_symbols=symbol,
-            timeframe=TimeFrame.Day,
-            start=start_date,
-            end=date
-        )
         
         try:
-            bars = self._client.get_stock_bars(request_params).df
-            if len(bars) < self._sma_period:
-                return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
-                                    price=bars['close'].iloc[-1], quantity=0)
-            
-            bars = self._calculate_indicators(bars)
-            
-            current_bar = bars.iloc[-1]
-            previous_bar = bars.iloc[-2]
-            current_price = current_bar['close']
-            
-            can_buy = cash >= (current_price * self._trade_quantity)
+            prepared = self._prepared.get(symbol)
+            if prepared is not None and prepared['start'] <= date <= prepared['end']:
+                # Inside a prepared window: no fetch, just index the precomputed arrays
+                frame = prepared['frame']
+                i = frame.index_at(date)
+                if i < 0:
+                    raise ValueError("No market data available up to this date")
+                current_price = frame.close[i]
+                if i < 1 or i + 1 < self._sma_period:
+                    return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
+                                        price=current_price, quantity=0)
+                macd_prev, signal_prev = frame.macd[i - 1], frame.signal[i - 1]
+                macd, signal, rsi, sma = frame.macd[i], frame.signal[i], frame.rsi[i], frame.sma[i]
+                self._check_indicators(macd, signal, rsi, sma)
+            else:
+                state = self._state.get(symbol)
+                if state is None or date < state.end:
+                    # First call or going back in time: rebuild from the full lookback window
+                    start_date = date - timedelta(days=self._lookback_days)
+                    bars = self._fetch_bars(symbol, start_date, date)
+                    if len(bars) < self._sma_period:
+                        return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
+                                            price=bars['close'].iloc[-1], quantity=0)
+                    state = self._calculate_indicators(bars)
+                elif date > state.end:
+                    # Only fetch the bars that arrived since the last call
+                    bars = self._fetch_bars(symbol, state.last_bar + timedelta(seconds=1), date)
+                    if len(bars) > 0:
+                        state.advance(bars)
+                state.end = date
+                self._state[symbol] = state
+                
+                macd_prev, signal_prev = state.prev_macd, state.prev_signal
+                macd, signal, rsi, sma = state.macd, state.signal, state.rsi, state.sma
+                current_price = state.close
             
-            rsi_period, rsi_overbought, rsi_oversold = self._rsi_params
+            _, rsi_overbought, rsi_oversold = self._rsi_params
+            decision = _decide(macd_prev, signal_prev, macd, signal, rsi, sma, current_price,
+                               rsi_overbought, rsi_oversold)
             
-            # Modified signal generation with less restrictive conditions
-            if (current_bar['MACD_12_26_9'] > current_bar['MACDs_12_26_9'] and 
-                previous_bar['MACD_12_26_9'] <= previous_bar['MACDs_12_26_9']):
-                # Primary condition: MACD crossover
-                
-                # Secondary confirmations (need only 1 out of 2)
-                confirmations = 0
-                if current_bar['RSI'] < rsi_overbought:  # Not overbought
-                    confirmations += 1
-                if current_price > current_bar['SMA']:  # Above 200 SMA
-                    confirmations += 1
-                
-                if confirmations >= 1 and can_buy:  # Need only one confirmation
-                    return MarketDecision(symbol=symbol, action=MarketAction.BUY, 
-                                        price=current_price, quantity=self._trade_quantity)
-                                        
-            elif (current_bar['MACD_12_26_9'] < current_bar['MACDs_12_26_9'] and 
-                  previous_bar['MACD_12_26_9'] >= previous_bar['MACDs_12_26_9'] and
-                  (current_bar['RSI'] > rsi_oversold or  # Either oversold
-                   current_price < current_bar['SMA'])):  # or below 200 SMA
-                if position >= self._trade_quantity:
-                    return MarketDecision(symbol=symbol, action=MarketAction.SELL, 
-                                        price=current_price, quantity=self._trade_quantity)
+            if decision == 1 and cash >= (current_price * self._trade_quantity):
+                return MarketDecision(symbol=symbol, action=MarketAction.BUY, 
+                                    price=current_price, quantity=self._trade_quantity)
+            if decision == -1 and position >= self._trade_quantity:
+                return MarketDecision(symbol=symbol, action=MarketAction.SELL, 
+                                    price=current_price, quantity=self._trade_quantity)
             
             return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
                                 price=current_price, quantity=0)
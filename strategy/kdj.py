@@ -1,11 +1,11 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
-from alpaca.trading.client import TradingClient
-import pandas_ta as ta
 from interface import MarketAction, MarketDecision, IStrategy
+from clients import make_clients
+from data_cache import get_bars
+from indicators import stoch_kd
+from utils._njit import NUMBA_AVAILABLE
 
 class KDJStrategy(IStrategy):
     def __init__(self, api_key: str, api_secret: str,
@@ -14,31 +14,140 @@ class KDJStrategy(IStrategy):
                  k_period: int = 14,
                  d_period: int = 3,
                  smooth_k: int = 3):
-        self._client = StockHistoricalDataClient(api_key, api_secret)
-        self._trading_client = TradingClient(api_key, api_secret)
+        # Clients are shared by every strategy created with the same credentials
+        self._client, self._trading_client = make_clients(api_key, api_secret)
         self._lookback_days = lookback_days
         self._trade_quantity = trade_quantity
         self._kdj_params = (k_period, d_period, smooth_k)
+        # Per-symbol tail of recent bars so consecutive calls only fetch new bars
+        self._state = {}
+        # Per-symbol KDJ precomputed over a whole backtest window by prepare()
+        self._prepared = {}
 
-    def _calculate_kdj(self, data: pd.DataFrame) -> pd.DataFrame:
-        # Calculate KDJ using pandas_ta
+    def _fetch_bars(self, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+        return get_bars(self._client, symbol, start, end)
+
+    def _update_bars(self, symbol: str, date: datetime) -> pd.DataFrame:
+        """
+        Return the bars needed to evaluate KDJ up to the given date.
+        KDJ only looks back k_period + smooth_k + d_period bars, so just that tail
+        is kept per symbol and extended with the bars that arrived since the last
+        call. A full lookback fetch is done on the first call or when asked for
+        an earlier date.
+        """
+        state = self._state.get(symbol)
+        if state is None or date < state['end']:
+            start_date = date - timedelta(days=self._lookback_days)
+            bars = self._fetch_bars(symbol, start_date, date)
+        elif date > state['end']:
+            last_bar = state['bars'].index.get_level_values(1)[-1]
+            new_bars = self._fetch_bars(symbol, last_bar + timedelta(seconds=1), date)
+            bars = pd.concat([state['bars'], new_bars]) if len(new_bars) > 0 else state['bars']
+        else:
+            bars = state['bars']
+
+        if len(bars) > 0:
+            k_period, d_period, smooth_k = self._kdj_params
+            tail_length = k_period + d_period + smooth_k
+            self._state[symbol] = {'end': date, 'bars': bars.iloc[-tail_length:]}
+        return bars
+
+    def prepare(self, symbol='AAPL', start=None, end=None):
+        """
+        Fetch bars for the whole [start, end] window plus the lookback buffer in
+        a single request and compute %K/%D over all of them once as plain arrays.
+        generate_signal then looks up the values for each date instead of
+        fetching and recomputing.
+        """
+        bars = get_bars(self._client, symbol, start - timedelta(days=self._lookback_days), end)
+        k, d = self._kdj_arrays(bars['high'].to_numpy(dtype=np.float64),
+                                bars['low'].to_numpy(dtype=np.float64),
+                                bars['close'].to_numpy(dtype=np.float64))
+        # Crossovers for every bar at once: cross_up[i] means %K crossed above %D at bar i
+        cross_up = np.zeros(len(k), dtype=bool)
+        cross_down = np.zeros(len(k), dtype=bool)
+        cross_up[1:] = (k[1:] > d[1:]) & (k[:-1] <= d[:-1])
+        cross_down[1:] = (k[1:] < d[1:]) & (k[:-1] >= d[:-1])
+        self._prepared[symbol] = {
+            'start': start,
+            'end': end,
+            'times': bars.index.get_level_values(1),
+            'close': bars['close'].to_numpy(dtype=np.float64),
+            'k': k,
+            'd': d,
+            'cross_up': cross_up,
+            'cross_down': cross_down
+        }
+
+    def signal_arrays(self, symbol='AAPL', dates=None):
+        """
+        %K/%D for each of the given dates from the prepared arrays, resolved the
+        same way generate_signal resolves a single date. Returns None when the
+        dates are not covered by a prepare() call.
+        """
+        prepared = self._prepared.get(symbol)
+        if (prepared is None or len(dates) == 0 or len(prepared['times']) == 0
+                or dates[0] < prepared['start'] or dates[-1] > prepared['end']):
+            return None
+
+        bar_times = dates.tz_localize('UTC') if dates.tz is None else dates
+        i = prepared['times'].searchsorted(bar_times, side='right') - 1
+        has_prev = i >= 1
+        curr = np.maximum(i, 0)
+        prev = np.maximum(i - 1, 0)
+
+        k, d = prepared['k'], prepared['d']
+        k_curr, d_curr = k[curr], d[curr]
+        k_prev = np.where(has_prev, k[prev], np.nan)
+        d_prev = np.where(has_prev, d[prev], np.nan)
+        # Days before the first bar have no decision; from the second bar on,
+        # NaN %K/%D is an error like in generate_signal
+        valid = (i >= 0) & (~has_prev | ~(np.isnan(k_curr) | np.isnan(d_curr)))
+        return prepared['close'][curr], k_curr, d_curr, k_prev, d_prev, valid, self._trade_quantity
+
+    def _kdj_arrays(self, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        """
+        %K and %D over a whole series, matching pandas_ta's stoch: raw %K from
+        rolling k_period lows/highs, smoothed by an SMA of smooth_k, and %D as
+        an SMA of d_period over %K. With numba the rolling extremes come from
+        the O(n) monotonic-deque kernel; otherwise from pandas rolling windows.
+        """
         k_period, d_period, smooth_k = self._kdj_params
-        stoch = ta.stoch(data['high'], data['low'], data['close'], 
-                        k=k_period, d=d_period, smooth_k=smooth_k)
+        if NUMBA_AVAILABLE:
+            return stoch_kd(high, low, close, k_period, d_period, smooth_k)
         
-        if stoch is None:
+        lowest_low = pd.Series(low).rolling(k_period).min().to_numpy()
+        highest_high = pd.Series(high).rolling(k_period).max().to_numpy()
+        price_range = highest_high - lowest_low
+        if (price_range == 0).any():
+            price_range = price_range + np.finfo(np.float64).eps
+        raw_k = 100 * (close - lowest_low) / price_range
+        k = pd.Series(raw_k).rolling(smooth_k).mean().to_numpy()
+        d = pd.Series(k).rolling(d_period).mean().to_numpy()
+        return k, d
+
+    @staticmethod
+    def _to_bar_time(date: datetime) -> pd.Timestamp:
+        # Bar timestamps are UTC; naive dates are treated as UTC like Alpaca does
+        date = pd.Timestamp(date)
+        return date.tz_localize('UTC') if date.tzinfo is None else date
+
+    def _calculate_kdj(self, data: pd.DataFrame) -> tuple:
+        """
+        Calculate KDJ over the bars and return only what the crossover needs:
+        (k_curr, d_curr, k_prev, d_prev) for the last two bars.
+        """
+        if len(data) < max(self._kdj_params):
             raise ValueError("Failed to calculate KDJ indicators")
-            
+        k, d = self._kdj_arrays(data['high'].to_numpy(dtype=np.float64),
+                                data['low'].to_numpy(dtype=np.float64),
+                                data['close'].to_numpy(dtype=np.float64))
+        
         # Verify we have valid Stochastic values
-        if stoch.iloc[-1].isna().any():
+        if np.isnan(k[-1]) or np.isnan(d[-1]):
             raise ValueError("KDJ calculation resulted in NaN values")
         
-        # Add KDJ indicators to the dataframe
-        data['%K'] = stoch['STOCHk_14_3_3']
-        data['%D'] = stoch['STOCHd_14_3_3']
-        data['%J'] = 3 * data['%K'] - 2 * data['%D']
-        
-        return data
+        return k[-1], d[-1], k[-2], d[-2]
 
     def generate_signal(self, symbol='AAPL', date=None, position=0, cash=0.0) -> MarketDecision:
         """
@@ -55,40 +164,41 @@ class KDJStrategy(IStrategy):
         """
         if date is None:
             date = datetime.now()
-        start_date = date - timedelta(days=self._lookback_days)
-        
-        request_params = StockBarsRequest(
-            symbol_or_symbols=symbol,
-            timeframe=TimeFrame.Day,
-            start=start_date,
-            end=date
-        )
         
         try:
-            bars = self._client.get_stock_bars(request_params).df
-            if len(bars) < 2:
-                return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
-                                    price=bars['close'].iloc[-1], quantity=0)
-                
-            bars = self._calculate_kdj(bars)
-            
-            current_bar = bars.iloc[-1]
-            previous_bar = bars.iloc[-2]
-            
-            analysis_price = current_bar['close']
-            
-            # Check if we can afford to buy
-            can_buy = cash >= (analysis_price * self._trade_quantity)
+            prepared = self._prepared.get(symbol)
+            if prepared is not None and prepared['start'] <= date <= prepared['end']:
+                # Inside a prepared window: no fetch, just index the precomputed arrays
+                i = prepared['times'].searchsorted(self._to_bar_time(date), side='right') - 1
+                if i < 0:
+                    raise ValueError("No market data available up to this date")
+                analysis_price = prepared['close'][i]
+                if i < 1:
+                    return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
+                                        price=analysis_price, quantity=0)
+                if np.isnan(prepared['k'][i]) or np.isnan(prepared['d'][i]):
+                    raise ValueError("KDJ calculation resulted in NaN values")
+                buy_signal = prepared['cross_up'][i]
+                sell_signal = prepared['cross_down'][i]
+            else:
+                bars = self._update_bars(symbol, date)
+                if len(bars) < 2:
+                    return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
+                                        price=bars['close'].iloc[-1], quantity=0)
+                    
+                analysis_price = bars['close'].iat[-1]
+                k_curr, d_curr, k_prev, d_prev = self._calculate_kdj(bars)
+                buy_signal = k_curr > d_curr and k_prev <= d_prev
+                sell_signal = k_curr < d_curr and k_prev >= d_prev
             
-            # Generate signals based on K line crossing D line
-            if (current_bar['%K'] > current_bar['%D'] and 
-                previous_bar['%K'] <= previous_bar['%D']):
-                # Buy signal - use fixed quantity if we have enough cash
-                if can_buy:
+            # Generate signals based on K line crossing D line; most days have no
+            # crossover and fall straight through to HOLD
+            if buy_signal:
+                # Buy signal - use fixed quantity if we can afford it
+                if cash >= analysis_price * self._trade_quantity:
                     return MarketDecision(symbol=symbol, action=MarketAction.BUY, 
                                         price=analysis_price, quantity=self._trade_quantity)
-            elif (current_bar['%K'] < current_bar['%D'] and 
-                  previous_bar['%K'] >= previous_bar['%D']):
+            elif sell_signal:
                 # Sell signal - use fixed quantity if we have enough position
                 if position >= self._trade_quantity:
                     return MarketDecision(symbol=symbol, action=MarketAction.SELL, 
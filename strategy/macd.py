@@ -1,11 +1,12 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest, StockLatestBarRequest
-from alpaca.data.timeframe import TimeFrame
-from alpaca.trading.client import TradingClient
-import pandas_ta as ta
+from alpaca.data.requests import StockLatestBarRequest
 from interface import MarketAction, MarketDecision, IStrategy
+from clients import make_clients
+from data_cache import get_bars, BarCache
+from indicators import IndicatorState
+from indicator_frame import IndicatorFrame
 
 class MACDStrategy(IStrategy):
     def __init__(self, api_key: str, api_secret: str, 
@@ -13,26 +14,80 @@ class MACDStrategy(IStrategy):
                  trade_quantity: int = 300,  # Fixed quantity to trade
                  macd_fast: int = 12,
                  macd_slow: int = 26,
-                 macd_signal: int = 9):
-        self._client = StockHistoricalDataClient(api_key, api_secret)
-        self._trading_client = TradingClient(api_key, api_secret)
+                 macd_signal: int = 9,
+                 bar_cache: BarCache = None):
+        # Clients are shared by every strategy created with the same credentials
+        self._client, self._trading_client = make_clients(api_key, api_secret)
+        # Optional cache shared with other strategies to batch bar requests across symbols
+        self._bar_cache = bar_cache
         self._lookback_days = lookback_days
         self._trade_quantity = trade_quantity
         self._macd_params = (macd_fast, macd_slow, macd_signal)
+        # Per-symbol EMA state so consecutive calls only process new bars
+        self._state = {}
+        # Per-symbol indicator arrays precomputed over a whole backtest window by prepare()
+        self._prepared = {}
 
-    def _calculate_macd(self, data: pd.DataFrame) -> pd.DataFrame:
-        # Calculate MACD using pandas_ta library
-        macd = ta.macd(data['close'])
-        if macd is None:
+    def _fetch_bars(self, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+        if self._bar_cache is not None:
+            return self._bar_cache.get(symbol, start, end)
+        return get_bars(self._client, symbol, start, end)
+
+    def _init_state(self, data: pd.DataFrame) -> IndicatorState:
+        """
+        Bootstrap the EMA state from a full lookback window of bars.
+        The fused kernel computes the same EMAs as pandas_ta's MACD, so the
+        seeded values match it.
+        """
+        macd_fast, macd_slow, macd_signal = self._macd_params
+        state = IndicatorState.from_bars(data, macd_fast, macd_slow, macd_signal)
+        if np.isnan(state.ema_fast) or np.isnan(state.ema_slow):
             raise ValueError("Failed to calculate MACD indicators")
             
         # Verify we have valid MACD values
-        if macd.iloc[-1].isna().any():
+        if np.isnan(state.signal):
             raise ValueError("MACD calculation resulted in NaN values")
-            
-        # Concatenate the MACD columns with the original data
-        data = pd.concat([data, macd], axis=1)
-        return data
+
+        return state
+
+    def prepare(self, symbol='AAPL', start=None, end=None):
+        """
+        Fetch bars for the whole [start, end] window plus the lookback buffer in
+        a single request and compute MACD and its signal line over all of them
+        once. generate_signal then indexes the arrays for each date.
+        """
+        macd_fast, macd_slow, macd_signal = self._macd_params
+        bars = self._fetch_bars(symbol, start - timedelta(days=self._lookback_days), end)
+        self._prepared[symbol] = {
+            'start': start,
+            'end': end,
+            'frame': IndicatorFrame.from_bars(bars, macd_fast, macd_slow, macd_signal)
+        }
+
+    def signal_arrays(self, symbol='AAPL', dates=None):
+        """
+        MACD and signal line for each of the given dates from the prepared frame,
+        resolved the same way generate_signal resolves a single date. Returns
+        None when the dates are not covered by a prepare() call.
+        """
+        prepared = self._prepared.get(symbol)
+        if (prepared is None or len(dates) == 0 or len(prepared['frame'].times) == 0
+                or dates[0] < prepared['start'] or dates[-1] > prepared['end']):
+            return None
+
+        frame = prepared['frame']
+        i = frame.locate(dates)
+        has_prev = i >= 1
+        curr = np.maximum(i, 0)
+        prev = np.maximum(i - 1, 0)
+
+        macd_curr, signal_curr = frame.macd[curr], frame.signal[curr]
+        macd_prev = np.where(has_prev, frame.macd[prev], np.nan)
+        signal_prev = np.where(has_prev, frame.signal[prev], np.nan)
+        # Days before the first bar have no decision; from the second bar on,
+        # a NaN signal line is an error like in generate_signal
+        valid = (i >= 0) & (~has_prev | ~np.isnan(signal_curr))
+        return frame.close[curr], macd_curr, signal_curr, macd_prev, signal_prev, valid, self._trade_quantity
 
     def generate_signal(self, symbol='AAPL', date=None, position=0, cash=0.0) -> MarketDecision:
         """
@@ -49,42 +104,56 @@ class MACDStrategy(IStrategy):
         """
         if date is None:
             date = datetime.now()
-        start_date = date - timedelta(days=self._lookback_days)
-        
-        request_params = StockBarsRequest(
-            symbol_or_symbols=symbol,
-            timeframe=TimeFrame.Day,
-            start=start_date,
-            end=date
-        )
         
         try:
-            bars = self._client.get_stock_bars(request_params).df
-            if len(bars) < 2:
-                return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
-                                    price=bars['close'].iloc[-1], quantity=0)
-            
-            # Calculate MACD values for the fetched data
-            bars = self._calculate_macd(bars)
-            
-            # Get the current and previous data points for analysis
-            current_bar = bars.iloc[-1]
-            previous_bar = bars.iloc[-2]
-            current_price = current_bar['close']
+            prepared = self._prepared.get(symbol)
+            if prepared is not None and prepared['start'] <= date <= prepared['end']:
+                # Inside a prepared window: no fetch, just index the precomputed arrays
+                frame = prepared['frame']
+                i = frame.index_at(date)
+                if i < 0:
+                    raise ValueError("No market data available up to this date")
+                current_price = frame.close[i]
+                if i < 1:
+                    return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
+                                        price=current_price, quantity=0)
+                macd, signal = frame.macd[i], frame.signal[i]
+                prev_macd, prev_signal = frame.macd[i - 1], frame.signal[i - 1]
+                if np.isnan(signal):
+                    raise ValueError("MACD calculation resulted in NaN values")
+            else:
+                state = self._state.get(symbol)
+                if state is None or date < state.end:
+                    # First call or going back in time: rebuild from the full lookback window
+                    start_date = date - timedelta(days=self._lookback_days)
+                    bars = self._fetch_bars(symbol, start_date, date)
+                    if len(bars) < 2:
+                        return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
+                                            price=bars['close'].iloc[-1], quantity=0)
+                    state = self._init_state(bars)
+                elif date > state.end:
+                    # Only fetch the bars that arrived since the last call
+                    bars = self._fetch_bars(symbol, state.last_bar + timedelta(seconds=1), date)
+                    if len(bars) > 0:
+                        state.advance(bars)
+                state.end = date
+                self._state[symbol] = state
+                
+                current_price = state.close
+                macd, signal = state.macd, state.signal
+                prev_macd, prev_signal = state.prev_macd, state.prev_signal
             
             # Check if we can afford to buy
             can_buy = cash >= (current_price * self._trade_quantity)
             
             # Generate trading signals based on MACD crossover
-            if (current_bar['MACD_12_26_9'] > current_bar['MACDs_12_26_9'] and 
-                previous_bar['MACD_12_26_9'] <= previous_bar['MACDs_12_26_9']):
+            if macd > signal and prev_macd <= prev_signal:
                 # Buy signal - use fixed quantity if we have enough cash
                 if can_buy:
                     return MarketDecision(symbol=symbol, action=MarketAction.BUY, 
                                         price=current_price, quantity=self._trade_quantity)
                                         
-            elif (current_bar['MACD_12_26_9'] < current_bar['MACDs_12_26_9'] and 
-                  previous_bar['MACD_12_26_9'] >= previous_bar['MACDs_12_26_9']):
+            elif macd < signal and prev_macd >= prev_signal:
                 # Sell signal - use fixed quantity if we have enough position
                 if position >= self._trade_quantity:
                     return MarketDecision(symbol=symbol, action=MarketAction.SELL, 
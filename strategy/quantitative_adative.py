@@ -1,12 +1,22 @@
 import pandas as pd
 import numpy as np
+import threading
+import weakref
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
-from alpaca.trading.client import TradingClient
-import pandas_ta as ta
 from interface import MarketAction, MarketDecision, IStrategy
+from clients import make_clients
+from data_cache import get_bars, BarCache
+from indicators import ADAPTIVE_COLUMNS, _adaptive_indicators, _adaptive_indicators_batch
+
+# Most indicator frames kept by each strategy's cache
+INDICATOR_CACHE_SIZE = 8
+
+# Indicator frames shared by every strategy instance, keyed by the indicator
+# parameters as well. Held weakly: a frame stays available to other instances
+# for as long as some strategy's own LRU cache still holds it.
+_shared_frames = weakref.WeakValueDictionary()
+_shared_frames_lock = threading.Lock()
 
 class QuantitativeAdaptiveStrategy(IStrategy):
     def __init__(self, api_key: str, api_secret: str,
@@ -20,9 +30,13 @@ class QuantitativeAdaptiveStrategy(IStrategy):
                  rsi_overbought: int = 70,
                  rsi_oversold: int = 30,
                  atr_period: int = 14,
-                 regime_period: int = 50):
-        self._client = StockHistoricalDataClient(api_key, api_secret)
-        self._trading_client = TradingClient(api_key, api_secret)
+                 regime_period: int = 50,
+                 bar_cache: BarCache = None,
+                 dtype: type = np.float64):
+        # Clients are shared by every strategy created with the same credentials
+        self._client, self._trading_client = make_clients(api_key, api_secret)
+        # Optional cache shared with other strategies to batch bar requests across symbols
+        self._bar_cache = bar_cache
         self._lookback_days = lookback_days
         self._trade_quantity = trade_quantity
         self._volatility_window = volatility_window
@@ -31,132 +45,308 @@ class QuantitativeAdaptiveStrategy(IStrategy):
         self._rsi_params = (rsi_period, rsi_overbought, rsi_oversold)
         self._atr_period = atr_period
         self._regime_period = regime_period
+        # Storage precision of the bars and indicators in the indicator frames.
+        # np.float32 halves the buffer the kernel streams through, which still
+        # accumulates in float64, but prices within float32 rounding of a band
+        # or threshold can flip a signal, and the traded price is read back
+        # from the frame
+        self._dtype = np.dtype(dtype)
+        # Frame column of each indicator row, Bollinger Bands suffixed like pandas_ta
+        bb_suffix = f"_{bollinger_length}_{float(bollinger_std)}"
+        self._indicator_columns = [name + bb_suffix if name.startswith('BB') else name
+                                   for name in ADAPTIVE_COLUMNS]
+        self._bb_lower_column = 'BBL' + bb_suffix
+        self._bb_upper_column = 'BBU' + bb_suffix
+        # Everything the indicator frames depend on besides the bars
+        self._indicator_params = (bollinger_length, float(bollinger_std), rsi_period, atr_period,
+                                  volume_ma_period, regime_period, volatility_window, self._dtype.str)
+        # LRU cache of indicator frames keyed by (parameters, symbol, last bar timestamp, number of bars)
+        self._indicator_cache = OrderedDict()
+        self._indicator_cache_lock = threading.Lock()
+        # Per-symbol scratch space for the indicator kernel, grown with the bars
+        self._scratch = {}
+        # Position of each column in the indicator frames, built on first use
+        self._col_idx = None
+        # BarCache used by generate_signals when no bar_cache was given, created on first use
+        self._signals_bar_cache = None
 
-    def _calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
-        # Calculate Bollinger Bands
-        bb_length, bb_std = self._bollinger_params
-        bb = ta.bbands(data['close'], length=bb_length, std=bb_std)
-        
-        # Calculate RSI
-        rsi_period, _, _ = self._rsi_params
-        rsi = ta.rsi(data['close'], length=rsi_period)
-        
-        # Calculate ATR for volatility
-        atr = ta.atr(data['high'], data['low'], data['close'], length=self._atr_period)
-        
-        # Calculate Volume Moving Average
-        volume_ma = ta.sma(data['volume'], length=self._volume_ma_period)
-        
-        # Calculate Market Regime using Hull Moving Average
-        hull_ma = ta.hma(data['close'], length=self._regime_period)
-        
-        # Calculate Rate of Change
-        roc = ta.roc(data['close'], length=10)
+    def _fetch_bars(self, symbol: str, start: datetime, end: datetime) -> pd.DataFrame:
+        if self._bar_cache is not None:
+            return self._bar_cache.get(symbol, start, end)
+        return get_bars(self._client, symbol, start, end)
+
+    def _bar_values(self, data: pd.DataFrame) -> np.ndarray:
+        # The bar columns followed by room for the indicator rows, one contiguous row per column
+        values = np.empty((data.shape[1] + len(ADAPTIVE_COLUMNS), len(data)), dtype=self._dtype)
+        for j, name in enumerate(data.columns):
+            values[j] = data[name].to_numpy(dtype=self._dtype)
+        return values
+
+    def _frame(self, data: pd.DataFrame, values: np.ndarray) -> pd.DataFrame:
+        # Wrap a filled _bar_values buffer as the indicator frame, without copying
+        return pd.DataFrame(values.T, index=data.index,
+                            columns=list(data.columns) + self._indicator_columns, copy=False)
+
+    def _calculate_indicators(self, data: pd.DataFrame, symbol: str = None) -> pd.DataFrame:
+        """
+        Compute every indicator in one fused pass (see indicators._adaptive_indicators,
+        which matches pandas_ta) and return the bars with the indicators as extra
+        columns. Bars and indicators are written into a single buffer of the
+        strategy's dtype, one contiguous row per column, that the returned frame
+        wraps without copying. The kernel's scratch space is kept per symbol and
+        reused.
+        """
+        n = len(data)
+        values = self._bar_values(data)
+        column = dict(zip(data.columns, values))
         
-        # Calculate Money Flow Index
-        mfi = ta.mfi(data['high'], data['low'], data['close'], data['volume'], length=14)
+        work = self._scratch.get(symbol)
+        if work is None or work.shape[1] < n:
+            work = self._scratch[symbol] = np.empty((4, n), dtype=np.float64)
         
-        # Combine all indicators
-        data = pd.concat([
-            data,
-            bb,
-            rsi.rename('RSI'),
-            atr.rename('ATR'),
-            volume_ma.rename('Volume_MA'),
-            hull_ma.rename('HMA'),
-            roc.rename('ROC'),
-            mfi.rename('MFI')
-        ], axis=1)
+        bb_length, bb_std = self._bollinger_params
+        rsi_period, _, _ = self._rsi_params
+        _adaptive_indicators(column['high'], column['low'], column['close'], column['volume'],
+                             bb_length, float(bb_std), rsi_period, self._atr_period,
+                             self._volume_ma_period, self._regime_period, 10, 14, self._volatility_window,
+                             values[data.shape[1]:], work)
+        return self._frame(data, values)
+
+    def _calculate_indicators_batch(self, batch: dict) -> dict:
+        """
+        Indicator frames for many symbols' bars at once, with one parallel kernel
+        call over all of them (see indicators._adaptive_indicators_batch)
+        Args:
+            batch: Dict of symbol to bars DataFrame
+        Returns:
+            Dict of symbol to indicator frame, as from _calculate_indicators
+        """
+        max_bars = max(len(bars) for bars in batch.values())
+        fields = {name: np.zeros((len(batch), max_bars), dtype=self._dtype) for name in ('high', 'low', 'close', 'volume')}
+        lengths = np.empty(len(batch), dtype=np.int64)
+        for s, bars in enumerate(batch.values()):
+            lengths[s] = len(bars)
+            for name, field in fields.items():
+                field[s, :len(bars)] = bars[name].to_numpy(dtype=self._dtype)
         
-        # Calculate volatility regime
-        data['Volatility'] = data['close'].pct_change().rolling(self._volatility_window).std()
+        out = np.empty((len(batch), len(ADAPTIVE_COLUMNS), max_bars), dtype=self._dtype)
+        work = np.empty((len(batch), 4, max_bars))
+        bb_length, bb_std = self._bollinger_params
+        rsi_period, _, _ = self._rsi_params
+        _adaptive_indicators_batch(fields['high'], fields['low'], fields['close'], fields['volume'], lengths,
+                                   bb_length, float(bb_std), rsi_period, self._atr_period,
+                                   self._volume_ma_period, self._regime_period, 10, 14, self._volatility_window,
+                                   out, work)
         
+        frames = {}
+        for s, (symbol, bars) in enumerate(batch.items()):
+            values = self._bar_values(bars)
+            values[bars.shape[1]:] = out[s, :, :lengths[s]]
+            frames[symbol] = self._frame(bars, values)
+        return frames
+
+    def _cache_key(self, symbol: str, bars: pd.DataFrame) -> tuple:
+        return (self._indicator_params, symbol, bars.index.get_level_values(1)[-1].value, len(bars))
+
+    def _cache_get(self, key: tuple) -> pd.DataFrame:
+        # This strategy's LRU first, then frames computed by other instances
+        with self._indicator_cache_lock:
+            data = self._indicator_cache.get(key)
+            if data is not None:
+                self._indicator_cache.move_to_end(key)
+                return data
+        with _shared_frames_lock:
+            data = _shared_frames.get(key)
+        if data is not None:
+            self._cache_put(key, data)
+        return data
+
+    def _cache_put(self, key: tuple, data: pd.DataFrame):
+        with self._indicator_cache_lock:
+            self._indicator_cache[key] = data
+            if len(self._indicator_cache) > INDICATOR_CACHE_SIZE:
+                self._indicator_cache.popitem(last=False)
+        with _shared_frames_lock:
+            _shared_frames[key] = data
+
+    def _cached_indicators(self, symbol: str, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        Indicators for the bars, reused when the same bars were seen before,
+        e.g. repeated calls between two daily bars or another instance with the
+        same indicator parameters on the same symbol. Callers must not modify
+        the returned frame.
+        """
+        key = self._cache_key(symbol, bars)
+        data = self._cache_get(key)
+        if data is not None:
+            return data
+        data = self._calculate_indicators(bars, symbol)
+        self._cache_put(key, data)
         return data
 
     def _detect_market_regime(self, data: pd.DataFrame) -> str:
-        current = data.iloc[-1]
+        close = data['close'].to_numpy()
+        hma = data['HMA'].to_numpy()
+        volatility = data['Volatility'].to_numpy()
         
         # Determine trend using Hull MA
-        trend = "uptrend" if current['close'] > current['HMA'] else "downtrend"
+        trend = "uptrend" if close[-1] > hma[-1] else "downtrend"
         
-        # Determine volatility regime
-        vol_percentile = data['Volatility'].quantile(0.7)
-        volatility = "high" if current['Volatility'] > vol_percentile else "low"
+        # Determine volatility regime against the 70th percentile of its history.
+        # np.quantile selects the two neighbouring order statistics with a
+        # partition instead of sorting, and matches Series.quantile
+        history = volatility[~np.isnan(volatility)]
+        vol_percentile = np.quantile(history, 0.7) if len(history) > 0 else np.nan
+        volatility = "high" if volatility[-1] > vol_percentile else "low"
         
         return f"{trend}_{volatility}"
 
-    def generate_signal(self, symbol='AAPL', date=None, position=0, cash=0.0) -> MarketDecision:
-        if date is None:
-            date = datetime.now()
-        start_date = date - timedelta(days=self._lookback_days)
+    def _decide(self, symbol: str, bars: pd.DataFrame, position: int, cash: float) -> MarketDecision:
+        """Trading decision from an indicator frame's last bar"""
+        if self._col_idx is None:
+            self._col_idx = {name: i for i, name in enumerate(bars.columns)}
+        col = self._col_idx
+        # Last row as a plain float64 array, read by column position
+        current = bars.iloc[-1:].to_numpy(dtype=np.float64).ravel()
+        current_price = current[col['close']]
         
-        request_params = StockBarsRequest(
-            symbol_or_symbols=symbol,
-            timeframe=TimeFrame.Day,
-            start=start_date,
-            end=date
-        )
+        # Determine if we can afford to trade
+        can_buy = cash >= (current_price * self._trade_quantity)
+        can_sell = position >= self._trade_quantity
+        if not can_buy and not can_sell:
+            # Neither action is possible, skip the regime and signal work
+            return MarketDecision(symbol=symbol, action=MarketAction.HOLD,
+                                price=current_price, quantity=0)
         
-        try:
-            bars = self._client.get_stock_bars(request_params).df
-            if len(bars) < self._regime_period:
-                return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
-                                    price=bars['close'].iloc[-1], quantity=0)
-            
-            bars = self._calculate_indicators(bars)
-            current = bars.iloc[-1]
-            previous = bars.iloc[-2]
-            current_price = current['close']
-            
-            # Determine if we can afford to trade
-            can_buy = cash >= (current_price * self._trade_quantity)
-            
-            # Get market regime
-            regime = self._detect_market_regime(bars)
-            
-            # Define entry/exit thresholds based on regime
-            rsi_period, rsi_overbought, rsi_oversold = self._rsi_params
-            
-            # Adjust thresholds based on market regime
-            if regime == "uptrend_low":
-                rsi_oversold += 5
-                rsi_overbought += 5
-            elif regime == "downtrend_high":
-                rsi_oversold -= 5
-                rsi_overbought -= 5
-            
-            # Generate trading signals
+        # Get market regime
+        regime = self._detect_market_regime(bars)
+        
+        # Define entry/exit thresholds based on regime
+        rsi_period, rsi_overbought, rsi_oversold = self._rsi_params
+        
+        # Adjust thresholds based on market regime
+        if regime == "uptrend_low":
+            rsi_oversold += 5
+            rsi_overbought += 5
+        elif regime == "downtrend_high":
+            rsi_oversold -= 5
+            rsi_overbought -= 5
+        
+        # Generate trading signals on scalar floats, only for the actions that are possible
+        volume = current[col['volume']]
+        volume_ma = current[col['Volume_MA']]
+        rsi = current[col['RSI']]
+        mfi = current[col['MFI']]
+        roc = current[col['ROC']]
+        if can_buy:
             buy_signals = [
-                current['close'] < current['BBL_20_2.0'],  # Price below lower Bollinger Band
-                current['RSI'] < rsi_oversold,  # RSI oversold
-                current['volume'] > current['Volume_MA'] * 1.5,  # High volume
-                current['MFI'] < 30,  # Money Flow Index oversold
-                current['ROC'] > 0  # Positive Rate of Change
-            ]
-            
-            sell_signals = [
-                current['close'] > current['BBU_20_2.0'],  # Price above upper Bollinger Band
-                current['RSI'] > rsi_overbought,  # RSI overbought
-                current['volume'] > current['Volume_MA'] * 1.5,  # High volume
-                current['MFI'] > 70,  # Money Flow Index overbought
-                current['ROC'] < 0  # Negative Rate of Change
+                current_price < current[col[self._bb_lower_column]],  # Price below lower Bollinger Band
+                rsi < rsi_oversold,  # RSI oversold
+                volume > volume_ma * 1.5,  # High volume
+                mfi < 30,  # Money Flow Index oversold
+                roc > 0  # Positive Rate of Change
             ]
             
             # Calculate signal strength
             buy_strength = sum(buy_signals) / len(buy_signals)
-            sell_strength = sum(sell_signals) / len(sell_signals)
-            
-            # Make trading decision
-            if buy_strength >= 0.6 and can_buy:  # At least 60% of buy signals are true
+            if buy_strength >= 0.6:  # At least 60% of buy signals are true
                 return MarketDecision(symbol=symbol, action=MarketAction.BUY,
                                     price=current_price, quantity=self._trade_quantity)
-            elif sell_strength >= 0.6 and position >= self._trade_quantity:
+        
+        if can_sell:
+            sell_signals = [
+                current_price > current[col[self._bb_upper_column]],  # Price above upper Bollinger Band
+                rsi > rsi_overbought,  # RSI overbought
+                volume > volume_ma * 1.5,  # High volume
+                mfi > 70,  # Money Flow Index overbought
+                roc < 0  # Negative Rate of Change
+            ]
+            
+            sell_strength = sum(sell_signals) / len(sell_signals)
+            if sell_strength >= 0.6:
                 return MarketDecision(symbol=symbol, action=MarketAction.SELL,
                                     price=current_price, quantity=self._trade_quantity)
+        
+        return MarketDecision(symbol=symbol, action=MarketAction.HOLD,
+                            price=current_price, quantity=0)
+
+    def generate_signal(self, symbol='AAPL', date=None, position=0, cash=0.0) -> MarketDecision:
+        if date is None:
+            date = datetime.now()
+        start_date = date - timedelta(days=self._lookback_days)
+        
+        try:
+            bars = self._fetch_bars(symbol, start_date, date)
+            if len(bars) < self._regime_period:
+                return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
+                                    price=bars['close'].values[-1], quantity=0)
             
-            return MarketDecision(symbol=symbol, action=MarketAction.HOLD,
-                                price=current_price, quantity=0)
+            bars = self._cached_indicators(symbol, bars)
+            return self._decide(symbol, bars, position, cash)
             
         except Exception as e:
             raise RuntimeError(f"Failed to generate signal for {symbol}: {str(e)}")
-        
\ No newline at end of file
+
+    def generate_signals(self, symbols, date=None, positions=None, cash=0.0) -> list:
+        """
+        Generate signals for many symbols at once: their bars come from batched
+        multi-symbol requests (through the strategy's BarCache, or one kept for
+        these calls), and their indicators from one kernel call that spreads
+        the symbols over all cores.
+        The cash is one budget shared by all symbols: symbols are decided in
+        order, and each BUY deducts its cost before the next symbol is decided,
+        so the decisions together never spend more than `cash`.
+        Args:
+            symbols: Stock ticker symbols to generate signals for
+            date: Date to generate the signals for
+            positions: Dict of symbol to number of shares held (missing means 0)
+            cash: Available cash shared by all symbols
+        Returns:
+            List of MarketDecision, one per symbol in order
+        """
+        if date is None:
+            date = datetime.now()
+        positions = positions or {}
+        start_date = date - timedelta(days=self._lookback_days)
+        bar_cache = self._bar_cache
+        if bar_cache is None:
+            if self._signals_bar_cache is None:
+                self._signals_bar_cache = BarCache(self._client, symbols)
+            bar_cache = self._signals_bar_cache
+        for symbol in symbols:
+            bar_cache.register(symbol)
+        
+        bars = {symbol: bar_cache.get(symbol, start_date, date) for symbol in symbols}
+        
+        # Reuse cached frames; compute the rest in one batch
+        frames = {}
+        batch = {}
+        for symbol, symbol_bars in bars.items():
+            if len(symbol_bars) < self._regime_period:
+                continue
+            frames[symbol] = self._cache_get(self._cache_key(symbol, symbol_bars))
+            if frames[symbol] is None:
+                batch[symbol] = symbol_bars
+        if batch:
+            try:
+                batch_frames = self._calculate_indicators_batch(batch)
+            except Exception as e:
+                raise RuntimeError(f"Failed to generate signals for {', '.join(batch)}: {str(e)}")
+            for symbol, frame in batch_frames.items():
+                self._cache_put(self._cache_key(symbol, batch[symbol]), frame)
+                frames[symbol] = frame
+        
+        decisions = []
+        for symbol in symbols:
+            try:
+                if symbol in frames:
+                    decision = self._decide(symbol, frames[symbol], positions.get(symbol, 0), cash)
+                    if decision.action == MarketAction.BUY:
+                        cash -= decision.price * decision.quantity
+                    decisions.append(decision)
+                else:
+                    decisions.append(MarketDecision(symbol=symbol, action=MarketAction.HOLD,
+                                                    price=bars[symbol]['close'].values[-1], quantity=0))
+            except Exception as e:
+                raise RuntimeError(f"Failed to generate signal for {symbol}: {str(e)}")
+        return decisions
@@ -1,11 +1,33 @@
 import pandas as pd
+import numpy as np
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
-from alpaca.trading.client import TradingClient
-import pandas_ta as ta
 from interface import MarketAction, MarketDecision, IStrategy
+from clients import make_clients
+from data_cache import get_bars
+from indicators import StreamingSMA
+
+@dataclass
+class _SMAState:
+    """Streaming short and long SMAs of a symbol, with their values at the last two bars"""
+    short: StreamingSMA
+    long: StreamingSMA
+    last_bar: pd.Timestamp = None
+    close: float = np.nan
+    short_value: float = np.nan
+    long_value: float = np.nan
+    prev_short: float = np.nan
+    prev_long: float = np.nan
+    end: datetime = None  # Date of the last signal the state was used for
+
+    def advance(self, data: pd.DataFrame):
+        """Feed newly fetched bars through both SMAs, O(1) per bar"""
+        for close in data['close'].to_numpy(dtype=np.float64):
+            self.prev_short, self.prev_long = self.short_value, self.long_value
+            self.short_value = self.short.update(close)
+            self.long_value = self.long.update(close)
+            self.close = close
+        self.last_bar = data.index.get_level_values(1)[-1]
 
 class SMAStrategy(IStrategy):
     def __init__(self, api_key: str, api_secret: str,
@@ -24,18 +46,20 @@ class SMAStrategy(IStrategy):
             short_window (int): Short-term SMA period
             long_window (int): Long-term SMA period
         """
-        self._client = StockHistoricalDataClient(api_key, api_secret)
-        self._trading_client = TradingClient(api_key, api_secret)
+        # Clients are shared by every strategy created with the same credentials
+        self._client, self._trading_client = make_clients(api_key, api_secret)
         self._lookback_days = lookback_days
         self._trade_quantity = trade_quantity
         self._short_window = short_window
         self._long_window = long_window
+        # Per-symbol streaming SMAs so consecutive calls only process new bars
+        self._state = {}
 
-    def _calculate_sma(self, data: pd.DataFrame) -> pd.DataFrame:
-        """Calculate short and long-term SMAs"""
-        data['SMA_short'] = ta.sma(data['close'], length=self._short_window)
-        data['SMA_long'] = ta.sma(data['close'], length=self._long_window)
-        return data
+    def _init_state(self, data: pd.DataFrame) -> _SMAState:
+        """Start short and long-term SMAs from a full lookback window of bars"""
+        state = _SMAState(short=StreamingSMA(self._short_window), long=StreamingSMA(self._long_window))
+        state.advance(data)
+        return state
 
     def generate_signal(self, symbol='AAPL', date=None, position=0, cash=0.0) -> MarketDecision:
         """
@@ -48,38 +72,38 @@ class SMAStrategy(IStrategy):
             date = datetime.now()
         start_date = date - timedelta(days=self._lookback_days)
         
-        request_params = StockBarsRequest(
-            symbol_or_symbols=symbol,
-            timeframe=TimeFrame.Day,
-            start=start_date,
-            end=date
-        )
-        
         try:
-            bars = self._client.get_stock_bars(request_params).df
-            if len(bars) < self._long_window:
-                return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
-                                    price=bars['close'].iloc[-1], quantity=0)
-            
-            bars = self._calculate_sma(bars)
+            state = self._state.get(symbol)
+            if state is None or date < state.end:
+                # First call or going back in time: restart from the full lookback window
+                bars = get_bars(self._client, symbol, start_date, date)
+                if len(bars) < self._long_window:
+                    return MarketDecision(symbol=symbol, action=MarketAction.HOLD, 
+                                        price=bars['close'].values[-1], quantity=0)
+                state = self._init_state(bars)
+            elif date > state.end:
+                # Only fetch the bars that arrived since the last call
+                bars = get_bars(self._client, symbol, state.last_bar + timedelta(seconds=1), date)
+                if len(bars) > 0:
+                    state.advance(bars)
+            state.end = date
+            self._state[symbol] = state
             
-            current = bars.iloc[-1]
-            previous = bars.iloc[-2]
-            current_price = current['close']
+            current_price = state.close
             
             # Check if we can afford to buy
             can_buy = cash >= (current_price * self._trade_quantity)
             
             # Generate signals based on SMA crossover
-            if (current['SMA_short'] > current['SMA_long'] and 
-                previous['SMA_short'] <= previous['SMA_long'] and
+            if (state.short_value > state.long_value and 
+                state.prev_short <= state.prev_long and
                 can_buy):
                 # Buy signal
                 return MarketDecision(symbol=symbol, action=MarketAction.BUY,
                                     price=current_price, quantity=self._trade_quantity)
                                     
-            elif (current['SMA_short'] < current['SMA_long'] and 
-                  previous['SMA_short'] >= previous['SMA_long'] and
+            elif (state.short_value < state.long_value and 
+                  state.prev_short >= state.prev_long and
                   position >= self._trade_quantity):
                 # Sell signal
                 return MarketDecision(symbol=symbol, action=MarketAction.SELL,
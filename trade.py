@@ -1,4 +1,5 @@
 import asyncio
+import time
 from alpaca.trading.client import TradingClient
 from alpaca.data.live import StockDataStream
 from alpaca.trading.requests import MarketOrderRequest
@@ -9,6 +10,7 @@ API_KEY = ""
 SECRET_KEY = ""
 PAPER = True  # Set to False for live trading
 SYMBOL = 'AAPL'  # Replace with your desired stock symbol
+MIN_DECISION_INTERVAL = 1.0  # Minimum seconds between two trading decisions
 
 # Initialize the Trading Client
 trading_client = TradingClient(API_KEY, SECRET_KEY, paper=PAPER)
@@ -16,20 +18,27 @@ trading_client = TradingClient(API_KEY, SECRET_KEY, paper=PAPER)
 # Variable to store the latest price
 latest_price = None
 
+# When the last trading decision was made, and a lock so decisions never overlap
+last_decision = 0.0
+decision_lock = asyncio.Lock()
+
 # Define the trade handler as an async function
 async def on_trade(trade):
-    global latest_price
+    global latest_price, last_decision
     if trade.symbol == SYMBOL:
         latest_price = trade.price
         print(f"Received live trade update for {SYMBOL}: ${latest_price}")
 
-# Define the trading logic
-async def trade_logic():
-    global latest_price
-    if latest_price is None:
-        print("No price data available yet.")
-        return
+        # Decide on the new price right away, at most once per MIN_DECISION_INTERVAL;
+        # ticks arriving while a decision is in flight are skipped
+        now = time.monotonic()
+        if now - last_decision >= MIN_DECISION_INTERVAL and not decision_lock.locked():
+            async with decision_lock:
+                last_decision = now
+                await trade_logic()
 
+# Define the trading logic, run on price updates from on_trade
+async def trade_logic():
     # Define simple buy/sell rules
     if latest_price < 150:  # Buy if the price is below $150
         try:
@@ -57,27 +66,18 @@ async def trade_logic():
         except Exception as e:
             print(f"Error selling {SYMBOL}: {e}")
 
-# Main function to run the data stream and trading logic
+# Main function to run the data stream; the trading logic runs from on_trade
 async def main():
     # Initialize the Stock Data Stream
     data_stream = StockDataStream(API_KEY, SECRET_KEY)
     
     # Register the trade handler as a coroutine
     data_stream.subscribe_trades(on_trade, SYMBOL)
-    
-    # Start the data stream in a separate task
-    data_stream_task = asyncio.create_task(data_stream._run_forever())
 
-    print(f"Subscribed to trade updates for {SYMBOL}. Starting trading logic...")
+    print(f"Subscribed to trade updates for {SYMBOL}. Trading on each price update...")
 
-    # Continuously execute the trading logic at defined intervals
-    try:
-        while True:
-            await trade_logic()
-            await asyncio.sleep(60)  # Wait 1 minute before the next check
-    finally:
-        # Ensure the data stream is stopped if the program is interrupted
-        data_stream_task.cancel()
+    # Run the data stream until the program is interrupted
+    await data_stream._run_forever()
 
 # Run the main event loop
 if __name__ == "__main__":
@@ -0,0 +1,18 @@
+"""
+Optional numba support.
+When numba is not installed, `njit` is a no-op decorator, `prange` is
+`range`, and the decorated kernels run as plain Python; check NUMBA_AVAILABLE
+to pick a vectorized NumPy path instead where one exists.
+"""
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        # Support both bare @njit and @njit(cache=True, ...)
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func